@@ -18,7 +18,7 @@ CREATE TABLE dim_location (
     admin_region VARCHAR(100),
     climate_zone VARCHAR(50),
     elevation_meters INT,
-    location_hash VARCHAR(32) UNIQUE NOT NULL, -- MD5 of lat,long
+    location_hash VARCHAR(32) UNIQUE NOT NULL, -- 64-bit hash of lat,long (micro-degrees)
     effective_date DATE NOT NULL DEFAULT CURRENT_DATE,
     expiration_date DATE DEFAULT '9999-12-31',
     is_current BOOLEAN DEFAULT TRUE,
@@ -27,6 +27,8 @@ CREATE TABLE dim_location (
 
 CREATE INDEX idx_location_coords ON dim_location(latitude, longitude);
 CREATE INDEX idx_location_current ON dim_location(is_current) WHERE is_current = TRUE;
+-- Equality probes from the loader's location_hash = ANY(...) lookup
+CREATE INDEX idx_location_hash_current ON dim_location USING hash(location_hash) WHERE is_current = TRUE;
 
 -- Dim Soil: Soil characteristics dimension
 -- Design: Type 1 SCD (soil properties relatively static)
@@ -42,6 +44,11 @@ CREATE TABLE dim_soil (
     organic_carbon_0_5cm DECIMAL(6,3),
     bulk_density_0_5cm DECIMAL(5,3),
     water_capacity_0_5cm DECIMAL(5,2),
+    -- Composition total, checked by the data-quality tests (0-1 or 0-100 scale)
+    soil_composition_sum DECIMAL(6,2) GENERATED ALWAYS AS (
+        COALESCE(clay_content_0_5cm, 0) + COALESCE(sand_content_0_5cm, 0) +
+        COALESCE(silt_content_0_5cm, 0)
+    ) STORED,
     soil_depth_cm INT,
     extraction_date DATE NOT NULL,
     metadata JSONB,
@@ -244,7 +251,7 @@ CREATE INDEX idx_audit_time ON etl_audit_log(start_time);
 
 -- Idempotency control
 CREATE TABLE etl_idempotency_keys (
-    key_hash VARCHAR(64) PRIMARY KEY,
+    key_hash BYTEA PRIMARY KEY, -- SHA-256 of entity_type:entity_key
     entity_type VARCHAR(50) NOT NULL, -- 'weather', 'soil', 'crop'
     entity_key VARCHAR(100) NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -0,0 +1,32 @@
+-- db/init/02-dq-indexes.sql
+
+-- ==========================================
+-- DATA QUALITY INDEXES
+-- ==========================================
+-- Partial indexes holding only the rows that break a data-quality rule
+-- (tests/test_workflows.py). They stay empty on a clean warehouse, so the
+-- EXISTS probes answer from an empty index instead of scanning the table.
+-- Predicates must match the rules verbatim for the planner to use them.
+-- dim_soil pH is already served by idx_soil_ph.
+
+-- Dim Soil (existing warehouses: db/migrations/002-soil-composition-sum.sql)
+CREATE INDEX IF NOT EXISTS idx_dq_soil_composition ON dim_soil(soil_composition_sum)
+    WHERE ABS(soil_composition_sum - 100) > 5 AND ABS(soil_composition_sum - 1.0) > 0.05;
+
+-- Fact Weather (created on every partition)
+CREATE INDEX IF NOT EXISTS idx_dq_weather_temp_range ON fact_weather(date_key)
+    WHERE temp_max_c < -50 OR temp_max_c > 60 OR temp_min_c < -50 OR temp_min_c > 60;
+CREATE INDEX IF NOT EXISTS idx_dq_weather_temp_order ON fact_weather(date_key)
+    WHERE temp_max_c < temp_min_c;
+
+-- Dim Crop
+CREATE INDEX IF NOT EXISTS idx_dq_crop_optimal_temp ON dim_crop(crop_key)
+    WHERE optimal_temp_min_c IS NOT NULL AND optimal_temp_max_c IS NOT NULL
+    AND optimal_temp_max_c <= optimal_temp_min_c;
+CREATE INDEX IF NOT EXISTS idx_dq_crop_absolute_temp ON dim_crop(crop_key)
+    WHERE absolute_temp_min_c IS NOT NULL AND absolute_temp_max_c IS NOT NULL
+    AND absolute_temp_max_c <= absolute_temp_min_c;
+CREATE INDEX IF NOT EXISTS idx_dq_crop_water ON dim_crop(crop_key)
+    WHERE water_requirement_mm_day < 0;
+CREATE INDEX IF NOT EXISTS idx_dq_crop_sunlight ON dim_crop(crop_key)
+    WHERE sunlight_hours_min < 0 OR sunlight_hours_min > 24;
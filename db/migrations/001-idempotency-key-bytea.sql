@@ -0,0 +1,23 @@
+-- db/migrations/001-idempotency-key-bytea.sql
+
+-- ==========================================
+-- IDEMPOTENCY KEYS AS RAW DIGESTS
+-- ==========================================
+-- etl_idempotency_keys.key_hash held SHA-256 as 64 hex characters; it now
+-- holds the 32-byte digest (BYTEA). Converts existing keys in place, so
+-- records already seen stay deduplicated. Safe to re-run: does nothing once
+-- the column is BYTEA.
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'etl_idempotency_keys'
+        AND column_name = 'key_hash'
+        AND data_type <> 'bytea'
+    ) THEN
+        ALTER TABLE etl_idempotency_keys
+            ALTER COLUMN key_hash TYPE BYTEA USING decode(key_hash, 'hex');
+    END IF;
+END
+$$;
\ No newline at end of file
@@ -0,0 +1,18 @@
+-- db/migrations/002-soil-composition-sum.sql
+
+-- ==========================================
+-- DIM_SOIL COMPOSITION TOTAL
+-- ==========================================
+-- Adds the generated soil_composition_sum column (already in 01-schema.sql
+-- for fresh installs) and the partial index of the data-quality composition
+-- check. Adding a stored generated column rewrites dim_soil under an ACCESS
+-- EXCLUSIVE lock: run it outside ETL loads. Safe to re-run.
+
+ALTER TABLE dim_soil ADD COLUMN IF NOT EXISTS soil_composition_sum DECIMAL(6,2)
+    GENERATED ALWAYS AS (
+        COALESCE(clay_content_0_5cm, 0) + COALESCE(sand_content_0_5cm, 0) +
+        COALESCE(silt_content_0_5cm, 0)
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_dq_soil_composition ON dim_soil(soil_composition_sum)
+    WHERE ABS(soil_composition_sum - 100) > 5 AND ABS(soil_composition_sum - 1.0) > 0.05;
\ No newline at end of file
@@ -0,0 +1,10 @@
+-- db/migrations/003-location-hash-index.sql
+
+-- ==========================================
+-- DIM_LOCATION HASH LOOKUP INDEX
+-- ==========================================
+-- Hash index for the loader's location_hash = ANY(...) probe on current rows
+-- (already in 01-schema.sql for fresh installs). Safe to re-run.
+
+CREATE INDEX IF NOT EXISTS idx_location_hash_current
+    ON dim_location USING hash(location_hash) WHERE is_current = TRUE;
\ No newline at end of file
@@ -6,7 +6,13 @@ Agro-Climatic Data Warehouse ETL Package
 __version__ = "1.0.0"
 __author__ = "Data Engineering Team"
 
-from .config import ETLConfig
-from .orchestrator import ETLPipeline
+from .config import ETLConfig, get_config
 
-__all__ = ['ETLConfig', 'ETLPipeline']
\ No newline at end of file
+__all__ = ['ETLConfig', 'get_config', 'ETLPipeline']
+
+def __getattr__(name):
+    # ETLPipeline pulls in every extractor/loader: import it on first access only
+    if name == 'ETLPipeline':
+        from .orchestrator import ETLPipeline
+        return ETLPipeline
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
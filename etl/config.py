@@ -1,23 +1,35 @@
 # etl/config.py
 import os
 import socket
+import functools
+import atexit
+import queue
 from dataclasses import dataclass
 from typing import Optional
 import logging
+from logging.handlers import QueueHandler, QueueListener
 
+@functools.lru_cache(maxsize=1)
 def get_db_host() -> str:
     """
     Détecte automatiquement l'hôte PostgreSQL.
     Priorité : 
     1. Variable d'environnement DB_HOST si définie explicitement
-    2. 'postgres' si on peut résoudre ce nom (réseau Docker)
+    2. 'postgres' si on tourne dans Docker ou si on peut résoudre ce nom
     3. 'localhost' par défaut (exécution locale)
+    
+    Le résultat (y compris un échec de résolution) est mis en cache :
+    les sondes DNS peuvent bloquer plusieurs secondes sur un réseau mal configuré.
     """
     # Si DB_HOST est explicitement défini et différent de 'postgres', l'utiliser
     env_host = os.getenv('DB_HOST')
     if env_host and env_host != 'postgres':
         return env_host
     
+    # Dans Docker, le service s'appelle 'postgres' : inutile de sonder le DNS
+    if is_running_in_docker():
+        return 'postgres'
+    
     # Essayer de résoudre 'postgres' (nom de service Docker)
     try:
         socket.gethostbyname('postgres')
@@ -35,10 +47,19 @@ def get_db_host() -> str:
     # Fallback sur 127.0.0.1
     return '127.0.0.1'
 
+@functools.lru_cache(maxsize=1)
 def is_running_in_docker() -> bool:
-    """Vérifie si le code s'exécute dans un conteneur Docker."""
+    """Vérifie si le code s'exécute dans un conteneur Docker (résultat mis en cache)."""
     return os.path.exists('/.dockerenv') or os.getenv('DOCKER_CONTAINER') == 'true'
 
+# Valeurs par défaut de la base lues une seule fois, à l'import
+_DB_DEFAULTS = {
+    'port': int(os.getenv('DB_PORT', 5432)),
+    'database': os.getenv('DB_NAME', 'agroclimate'),
+    'user': os.getenv('DB_USER', 'etl_user'),
+    'password': os.getenv('DB_PASSWORD', 'etl_password'),
+}
+
 @dataclass
 class DatabaseConfig:
     host: str = None  # Sera initialisé dans __post_init__
@@ -46,19 +67,23 @@ class DatabaseConfig:
     database: str = None
     user: str = None
     password: str = None
+    pool_min_size: int = 4  # Connexions ouvertes au démarrage du pool
+    pool_max_size: int = 25
+    statement_timeout_ms: int = 300000  # Coupe les requêtes bloquées (5 min)
+    keepalives_idle: int = 60  # Secondes d'inactivité TCP avant le premier keepalive
     
     def __post_init__(self):
         """Initialise les valeurs par défaut après la création de l'instance."""
         if self.host is None:
             self.host = get_db_host()
         if self.port is None:
-            self.port = int(os.getenv('DB_PORT', 5432))
+            self.port = _DB_DEFAULTS['port']
         if self.database is None:
-            self.database = os.getenv('DB_NAME', 'agroclimate')
+            self.database = _DB_DEFAULTS['database']
         if self.user is None:
-            self.user = os.getenv('DB_USER', 'etl_user')
+            self.user = _DB_DEFAULTS['user']
         if self.password is None:
-            self.password = os.getenv('DB_PASSWORD', 'etl_password')
+            self.password = _DB_DEFAULTS['password']
     
     @property
     def connection_string(self) -> str:
@@ -74,9 +99,25 @@ class APIConfig:
     weather_api_url: str = "https://api.open-meteo.com/v1/forecast"
     weather_archive_url: str = "https://archive-api.open-meteo.com/v1/archive"
     weather_api_timeout: int = 30
+    weather_batch_size: int = 100  # Locations per multi-coordinate request
+    weather_csv_min_days: int = 366  # Single-location ranges this long use format=csv
     
-    # Rate limiting
+    # Rate limiting (token bucket: sustained rate + burst size)
     requests_per_second: float = 1.0
+    rate_limit_burst: int = 1
+    
+    # Concurrent in-flight requests per extractor
+    max_workers: int = 4
+    
+    # SoilGrids response cache (soil properties are static)
+    soil_cache_ttl_days: int = 30
+    
+    # Shared HTTP session (connection pool + urllib3 retries)
+    pool_connections: int = 32
+    pool_maxsize: int = 64
+    max_retries: int = 3
+    backoff_factor: float = 0.5
+    backoff_jitter: float = 0.5
 
 @dataclass
 class ScrapingConfig:
@@ -86,26 +127,72 @@ class ScrapingConfig:
     max_retries: int = 3
     respect_robots_txt: bool = True
 
+# QueueListener démarré par le premier setup_logging() du processus
+_log_listener: Optional[QueueListener] = None
+
 class ETLConfig:
     def __init__(self):
-        self.db = DatabaseConfig()
-        self.api = APIConfig()
-        self.scraping = ScrapingConfig()
         self.batch_size: int = int(os.getenv('ETL_BATCH_SIZE', 1000))
         self.log_level: str = os.getenv('LOG_LEVEL', 'INFO')
         self.data_retention_days: int = int(os.getenv('DATA_RETENTION_DAYS', 365))
+        # Répertoire du cache disque des réponses API (vide = désactivé)
+        default_cache_dir = '/app/cache' if is_running_in_docker() else './cache'
+        self.cache_dir: str = os.getenv('CACHE_DIR', default_cache_dir)
+        # Upsert fact_weather par UPDATE ... FROM + INSERT ... LEFT JOIN au lieu d'ON CONFLICT
+        self.weather_explicit_upsert: bool = os.getenv('ETL_WEATHER_EXPLICIT_UPSERT') == '1'
+    
+    # Sous-configurations construites au premier accès seulement
+    # (DatabaseConfig peut déclencher une résolution DNS)
+    @functools.cached_property
+    def db(self) -> DatabaseConfig:
+        return DatabaseConfig()
+    
+    @functools.cached_property
+    def api(self) -> APIConfig:
+        return APIConfig()
+    
+    @functools.cached_property
+    def scraping(self) -> ScrapingConfig:
+        return ScrapingConfig()
         
     def setup_logging(self) -> logging.Logger:
-        # Créer le répertoire logs si nécessaire (pour exécution locale)
-        log_dir = '/app/logs' if is_running_in_docker() else './logs'
-        os.makedirs(log_dir, exist_ok=True)
+        """
+        Configure le logging racine.
+        Par défaut uniquement sur stdout (le runtime du conteneur gère la rotation) ;
+        ETL_LOG_TO_FILE=1 ajoute etl.log. Les handlers tournent dans un
+        QueueListener : le thread ETL ne fait jamais l'écriture lui-même.
+        Idempotent : les appels suivants ne démarrent pas de second listener.
+        """
+        global _log_listener
+        if _log_listener is not None:
+            return logging.getLogger('etl_pipeline')
+        
+        handlers = [logging.StreamHandler()]
         
+        if os.getenv('ETL_LOG_TO_FILE') == '1':
+            # Créer le répertoire logs si nécessaire (pour exécution locale)
+            log_dir = '/app/logs' if is_running_in_docker() else './logs'
+            os.makedirs(log_dir, exist_ok=True)
+            handlers.append(logging.FileHandler(f'{log_dir}/etl.log'))
+        
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        
+        log_queue = queue.SimpleQueue()
+        _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _log_listener.start()
+        atexit.register(_log_listener.stop)  # Vide la file avant la sortie
+        
+        # Le formatage final est fait par les handlers du listener
         logging.basicConfig(
             level=getattr(logging, self.log_level),
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.StreamHandler(),
-                logging.FileHandler(f'{log_dir}/etl.log')
-            ]
+            format='%(message)s',
+            handlers=[QueueHandler(log_queue)]
         )
-        return logging.getLogger('etl_pipeline')
\ No newline at end of file
+        return logging.getLogger('etl_pipeline')
+
+@functools.lru_cache(maxsize=1)
+def get_config() -> ETLConfig:
+    """Instance partagée de ETLConfig, construite une seule fois par processus."""
+    return ETLConfig()
\ No newline at end of file
@@ -3,15 +3,23 @@
 Data Extraction Modules
 """
 
+from .session import build_http_session
 from .soil_api import SoilGridsExtractor, SoilData
 from .weather_api import OpenMeteoExtractor, WeatherData
-from .web_scraper import CropRequirementScraper, CropRequirementSource
 
 __all__ = [
+    'build_http_session',
     'SoilGridsExtractor',
     'SoilData', 
     'OpenMeteoExtractor',
     'WeatherData',
     'CropRequirementScraper',
     'CropRequirementSource'
-]
\ No newline at end of file
+]
+
+def __getattr__(name):
+    # The scraper drags in lxml.html: import it on first access only
+    if name in ('CropRequirementScraper', 'CropRequirementSource'):
+        from . import web_scraper
+        return getattr(web_scraper, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,36 @@
+# etl/extract/session.py
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from etl.config import ETLConfig
+
+def build_http_session(config: ETLConfig) -> requests.Session:
+    """
+    Build the HTTP session shared by all extractors
+    One pooled keep-alive adapter per scheme, so TCP/TLS connections are
+    reused across SoilGrids, Open-Meteo and the scraper. Transient errors
+    are retried by urllib3 with jittered exponential backoff (honouring
+    Retry-After on 429/503); other 4xx fail fast. The default
+    Accept-Encoding includes brotli when the brotli package is installed.
+    """
+    retry = Retry(
+        total=config.api.max_retries,
+        backoff_factor=config.api.backoff_factor,
+        backoff_jitter=config.api.backoff_jitter,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
+        allowed_methods=["GET"],
+        raise_on_status=False  # Let callers see the final response
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config.api.pool_connections,
+        pool_maxsize=config.api.pool_maxsize,
+        pool_block=False,
+        max_retries=retry
+    )
+    
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
\ No newline at end of file
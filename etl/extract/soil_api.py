@@ -1,13 +1,20 @@
 # etl/extract/soil_api.py
+import os
+import orjson
 import requests
 import time
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
-import hashlib
+from functools import lru_cache
+from urllib.parse import urlparse
+from diskcache import Cache
 
 from etl.config import ETLConfig
 from etl.utils.logger import ETLLogger
 from etl.utils.validators import GeoValidator
+from etl.utils.ratelimit import shared_bucket
+from etl.extract.session import build_http_session
 
 @dataclass
 class SoilData:
@@ -23,6 +30,24 @@ class SoilData:
     texture: Optional[str]
     extraction_timestamp: str
 
+@lru_cache(maxsize=4096)
+def _classify_texture(clay: float, sand: float, silt: float) -> str:
+    """Simplified USDA texture triangle (pure, cached)"""
+    if sand >= 85 and silt + 1.5 * clay < 15:
+        return "Sand"
+    elif silt >= 80 and clay < 12:
+        return "Silt"
+    elif clay >= 40:
+        return "Clay"
+    elif sand >= 52 and silt + 2 * clay < 50:
+        return "Sandy Loam"
+    elif silt >= 50 and clay < 27:
+        return "Silt Loam"
+    elif clay >= 27 and clay < 40 and sand > 20:
+        return "Clay Loam"
+    else:
+        return "Loam"
+
 class SoilGridsExtractor:
     """
     Extractor for ISRIC SoilGrids API v2.0
@@ -32,27 +57,38 @@ class SoilGridsExtractor:
     DEPTHS = ["0-5cm"]
     PROPERTIES = ["clay", "sand", "silt", "phh2o", "soc", "bdod", "wv0010"]
     VALUES = ["mean"]
+    HEADERS = {
+        "Accept": "application/json",
+        "User-Agent": "AgroClimate-ETL/1.0"
+    }
     
-    def __init__(self, config: ETLConfig, logger: ETLLogger):
+    def __init__(self, config: ETLConfig, logger: ETLLogger,
+                 session: Optional[requests.Session] = None):
         self.config = config
         self.logger = logger
-        self.session = requests.Session()
-        self.session.headers.update({
-            "Accept": "application/json",
-            "User-Agent": "AgroClimate-ETL/1.0"
-        })
-        self._last_request_time = 0
-    
-    def _rate_limit(self):
-        """Respect API rate limits"""
-        elapsed = time.time() - self._last_request_time
-        if elapsed < 1.0 / self.config.api.requests_per_second:
-            time.sleep(1.0 / self.config.api.requests_per_second - elapsed)
-        self._last_request_time = time.time()
+        self.session = session or build_http_session(config)
+        self.cache = Cache(os.path.join(config.cache_dir, 'soilgrids')) if config.cache_dir else None
+        # Respect API rate limits (shared by all worker threads)
+        self.bucket = shared_bucket(
+            self.session,
+            urlparse(config.api.soil_api_url).netloc,
+            config.api.requests_per_second,
+            config.api.rate_limit_burst
+        )
     
     def _make_request(self, lat: float, lon: float) -> Dict:
-        """Execute API request with retries"""
-        self._rate_limit()
+        """
+        Execute API request (retries handled by the session adapter)
+        Responses are cached on disk by rounded coordinates; stale entries
+        are revalidated with If-None-Match when the API sent an ETag.
+        """
+        coord_key = (round(lat, 6), round(lon, 6))
+        cached = self.cache.get(coord_key) if self.cache is not None else None
+        ttl_seconds = self.config.api.soil_cache_ttl_days * 86400
+        if cached and time.time() - cached['fetched_at'] < ttl_seconds:
+            return cached['data']
+        
+        self.bucket.acquire()
         
         params = {
             "lon": lon,
@@ -62,21 +98,30 @@ class SoilGridsExtractor:
             "value": self.VALUES
         }
         
-        for attempt in range(3):
-            try:
-                response = self.session.get(
-                    self.config.api.soil_api_url,
-                    params=params,
-                    timeout=self.config.api.soil_api_timeout
-                )
-                response.raise_for_status()
-                return response.json()
-            except requests.exceptions.RequestException as e:
-                if attempt == 2:
-                    raise
-                time.sleep(2 ** attempt)  # Exponential backoff
+        headers = self.HEADERS
+        if cached and cached.get('etag'):
+            headers = {**self.HEADERS, "If-None-Match": cached['etag']}
+        
+        response = self.session.get(
+            self.config.api.soil_api_url,
+            params=params,
+            headers=headers,
+            timeout=self.config.api.soil_api_timeout
+        )
         
-        return {}
+        if cached and response.status_code == 304:
+            data = cached['data']
+        else:
+            response.raise_for_status()
+            data = orjson.loads(response.content)
+        
+        if self.cache is not None:
+            self.cache.set(coord_key, {
+                'data': data,
+                'etag': response.headers.get('ETag'),
+                'fetched_at': time.time()
+            })
+        return data
     
     def _parse_response(self, data: Dict, lat: float, lon: float) -> SoilData:
         """Parse SoilGrids JSON response"""
@@ -122,46 +167,69 @@ class SoilGridsExtractor:
         if not all([clay, sand, silt]):
             return None
         
-        # Simplified texture triangle logic
-        if sand >= 85 and silt + 1.5 * clay < 15:
-            return "Sand"
-        elif silt >= 80 and clay < 12:
-            return "Silt"
-        elif clay >= 40:
-            return "Clay"
-        elif sand >= 52 and silt + 2 * clay < 50:
-            return "Sandy Loam"
-        elif silt >= 50 and clay < 27:
-            return "Silt Loam"
-        elif clay >= 27 and clay < 40 and sand > 20:
-            return "Clay Loam"
-        else:
-            return "Loam"
+        # Neighbouring grid cells repeat the same fractions: memoize on 0.1 precision
+        return _classify_texture(round(clay, 1), round(sand, 1), round(silt, 1))
     
-    def extract(self, coordinates: List[Tuple[float, float]]) -> List[SoilData]:
+    def _extract_one(self, coord: Tuple[float, float]) -> Optional[SoilData]:
+        """Fetch and parse a single coordinate, logging failures"""
+        lat, lon = coord
+        
+        try:
+            raw_data = self._make_request(lat, lon)
+            soil_data = self._parse_response(raw_data, lat, lon)
+            self.logger.log_extract("SoilGrids API", 1)
+            return soil_data
+        except Exception as e:
+            self.logger.log_error(e, f"SoilGrids API request ({lat}, {lon})")
+            return None
+    
+    def valid_coordinates(self, coordinates: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
         """
-        Extract soil data for multiple coordinates
-        Implements idempotency checking
+        Coordinates that will actually be fetched, in input order
+        Invalid ones are logged and dropped; duplicates (rounded) kept once.
         """
-        results = []
+        valid_coords = []
+        seen = set()
+        
+        # Validate all coordinates in one pass
+        valid, _ = GeoValidator.validate_coordinates_batch(
+            [lat for lat, _ in coordinates], [lon for _, lon in coordinates]
+        )
         
-        for lat, lon in coordinates:
-            # Validate coordinates
-            valid, error = GeoValidator.validate_coordinates(lat, lon)
-            if not valid:
+        for (lat, lon), ok in zip(coordinates, valid.tolist()):
+            if not ok:
+                _, error = GeoValidator.validate_coordinates(lat, lon)
                 self.logger.log_error(ValueError(error), f"Soil extraction for ({lat}, {lon})")
                 continue
             
-            # Check idempotency
-            coord_hash = hashlib.md5(f"{lat:.6f},{lon:.6f}".encode()).hexdigest()
-            # Idempotency check done at load phase for soil (static data)
-            
-            try:
-                raw_data = self._make_request(lat, lon)
-                soil_data = self._parse_response(raw_data, lat, lon)
-                results.append(soil_data)
-                self.logger.log_extract("SoilGrids API", 1)
-            except Exception as e:
-                self.logger.log_error(e, f"SoilGrids API request ({lat}, {lon})")
+            # Idempotency: fetch each (rounded) coordinate once per call
+            key = (round(lat, 6), round(lon, 6))
+            if key in seen:
+                continue
+            seen.add(key)
+            valid_coords.append((lat, lon))
+        
+        return valid_coords
+    
+    def iter_extract(self, coordinates: List[Tuple[float, float]]) -> Iterator[SoilData]:
+        """
+        Yield soil data as it is fetched (input order, failures skipped)
+        Requests are issued concurrently over the shared session; the
+        rate limiter still spaces them out globally.
+        """
+        if not coordinates:
+            return
         
-        return results
\ No newline at end of file
+        workers = min(self.config.api.max_workers, len(coordinates))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # pool.map preserves input order
+            for sd in pool.map(self._extract_one, coordinates):
+                if sd is not None:
+                    yield sd
+    
+    def extract(self, coordinates: List[Tuple[float, float]]) -> List[SoilData]:
+        """
+        Extract soil data for multiple coordinates
+        Implements idempotency checking (duplicate coordinates fetched once)
+        """
+        return list(self.iter_extract(self.valid_coordinates(coordinates)))
\ No newline at end of file
@@ -1,13 +1,19 @@
 # etl/extract/weather_api.py
+import io
+import orjson
 import requests
-import time
+import numpy as np
+import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
+from urllib.parse import urlparse
 
 from etl.config import ETLConfig
 from etl.utils.logger import ETLLogger
 from etl.utils.validators import GeoValidator
+from etl.utils.ratelimit import shared_bucket
+from etl.extract.session import build_http_session
 
 @dataclass
 class WeatherData:
@@ -31,50 +37,57 @@ class OpenMeteoExtractor:
     Docs: https://open-meteo.com/en/docs
     """
     
-    def __init__(self, config: ETLConfig, logger: ETLLogger):
+    # Open-Meteo recommends 1 req/sec for free tier
+    REQUESTS_PER_SECOND = 1.0
+    
+    # WeatherData field -> Open-Meteo daily variable (in WeatherData order)
+    FIELD_MAP = {
+        "temp_max": "temperature_2m_max",
+        "temp_min": "temperature_2m_min",
+        "temp_mean": "temperature_2m_mean",
+        "precipitation": "precipitation_sum",
+        "evapotranspiration": "et0_fao_evapotranspiration",
+        "solar_radiation": "shortwave_radiation_sum",
+        "humidity": "relative_humidity_2m_mean",
+        "wind_speed": "wind_speed_10m_max",
+        "weather_code": "weather_code"
+    }
+    
+    def __init__(self, config: ETLConfig, logger: ETLLogger,
+                 session: Optional[requests.Session] = None):
         self.config = config
         self.logger = logger
-        self.session = requests.Session()
-        self._last_request_time = 0
+        self.session = session or build_http_session(config)
+        self.bucket = shared_bucket(
+            self.session,
+            urlparse(config.api.weather_archive_url).netloc,
+            self.REQUESTS_PER_SECOND,
+            config.api.rate_limit_burst
+        )
     
-    def _rate_limit(self):
-        elapsed = time.time() - self._last_request_time
-        if elapsed < 1.0:  # Open-Meteo recommends 1 req/sec for free tier
-            time.sleep(1.0 - elapsed)
-        self._last_request_time = time.time()
-    
-    def extract_historical(self, 
-                          lat: float, 
-                          lon: float, 
-                          start_date: str,
-                          end_date: str) -> List[WeatherData]:
-        """
-        Extract historical weather data
-        date format: YYYY-MM-DD
-        """
-        valid, error = GeoValidator.validate_coordinates(lat, lon)
-        if not valid:
-            raise ValueError(error)
+    def _get_daily(self, 
+                   coordinates: List[Tuple[float, float]], 
+                   start_date: str,
+                   end_date: str,
+                   **extra_params) -> requests.Response:
+        """Validate coordinates and issue one rate-limited archive request"""
+        _, invalid = GeoValidator.validate_coordinates_batch(
+            [lat for lat, _ in coordinates], [lon for _, lon in coordinates]
+        )
+        if len(invalid):
+            # Scalar check for the message of the first offending point
+            raise ValueError(GeoValidator.validate_coordinates(*coordinates[invalid[0]])[1])
         
-        self._rate_limit()
+        self.bucket.acquire()
         
         params = {
-            "latitude": lat,
-            "longitude": lon,
+            "latitude": ",".join(str(lat) for lat, _ in coordinates),
+            "longitude": ",".join(str(lon) for _, lon in coordinates),
             "start_date": start_date,
             "end_date": end_date,
-            "daily": [
-                "temperature_2m_max",
-                "temperature_2m_min",
-                "temperature_2m_mean",
-                "precipitation_sum",
-                "et0_fao_evapotranspiration",
-                "shortwave_radiation_sum",
-                "relative_humidity_2m_mean",
-                "wind_speed_10m_max",
-                "weather_code"
-            ],
-            "timezone": "auto"
+            "daily": list(self.FIELD_MAP.values()),
+            "timezone": "auto",
+            **extra_params
         }
         
         try:
@@ -84,45 +97,148 @@ class OpenMeteoExtractor:
                 timeout=self.config.api.weather_api_timeout
             )
             response.raise_for_status()
-            data = response.json()
-            
-            return self._parse_daily_data(data, lat, lon)
+            return response
             
         except requests.exceptions.RequestException as e:
-            self.logger.log_error(e, f"Open-Meteo API request ({lat}, {lon})")
+            self.logger.log_error(e, f"Open-Meteo API request {coordinates}")
             raise
     
-    def _parse_daily_data(self, data: Dict, lat: float, lon: float) -> List[WeatherData]:
-        """Parse Open-Meteo daily response"""
+    def _fetch_daily_batch(self, 
+                           coordinates: List[Tuple[float, float]], 
+                           start_date: str,
+                           end_date: str) -> List[Dict]:
+        """
+        Request raw daily payloads for several locations in one call
+        Open-Meteo accepts comma-separated coordinates and answers with a
+        list (one object per location, in request order).
+        """
+        response = self._get_daily(coordinates, start_date, end_date)
+        
+        try:
+            data = orjson.loads(response.content)
+        except orjson.JSONDecodeError as e:
+            self.logger.log_error(e, f"Open-Meteo API request {coordinates}")
+            raise
+        
+        # A single location comes back as a bare object
+        return data if isinstance(data, list) else [data]
+    
+    def _fetch_daily_csv(self, 
+                         lat: float, 
+                         lon: float, 
+                         start_date: str,
+                         end_date: str) -> pd.DataFrame:
+        """
+        Request one location's daily series as CSV and parse it in C
+        Same columns as _daily_frame: date + FIELD_MAP keys, gaps as NaN.
+        """
+        response = self._get_daily([(lat, lon)], start_date, end_date, format="csv")
+        
+        # Location header row, its values and a blank line precede the series
+        raw = pd.read_csv(io.BytesIO(response.content), skiprows=3)
+        raw.columns = [c.split(" (")[0] for c in raw.columns]  # Drop unit suffixes
+        
+        frame = pd.DataFrame({"date": raw["time"].astype(str)})
+        for field, api_name in self.FIELD_MAP.items():
+            frame[field] = raw[api_name].astype(np.float64) if api_name in raw else np.nan
+        frame["weather_code"] = frame["weather_code"].astype("Int64")
+        return frame
+    
+    def _use_csv(self, start_date: str, end_date: str) -> bool:
+        """CSV pays off on long archive ranges; JSON is kept for short queries"""
+        span = datetime.strptime(end_date, "%Y-%m-%d") - datetime.strptime(start_date, "%Y-%m-%d")
+        return span.days + 1 >= self.config.api.weather_csv_min_days
+    
+    def _fetch_daily(self, 
+                     lat: float, 
+                     lon: float, 
+                     start_date: str,
+                     end_date: str) -> Dict:
+        """Request the raw daily payload for one location"""
+        return self._fetch_daily_batch([(lat, lon)], start_date, end_date)[0]
+    
+    def extract_historical_batch(self, 
+                                coordinates: List[Tuple[float, float]], 
+                                start_date: str,
+                                end_date: str) -> Dict[Tuple[float, float], List[WeatherData]]:
+        """
+        Extract historical weather data for many locations
+        Coordinates are grouped config.api.weather_batch_size per request.
+        Returns: mapping of (lat, lon) to its daily records
+        """
+        results = {}
+        batch_size = self.config.api.weather_batch_size
+        
+        for i in range(0, len(coordinates), batch_size):
+            chunk = coordinates[i:i + batch_size]
+            payloads = self._fetch_daily_batch(chunk, start_date, end_date)
+            for (lat, lon), data in zip(chunk, payloads):
+                results[(lat, lon)] = self._parse_daily_data(data, lat, lon)
+        
+        return results
+    
+    def extract_historical(self, 
+                          lat: float, 
+                          lon: float, 
+                          start_date: str,
+                          end_date: str) -> List[WeatherData]:
+        """
+        Extract historical weather data
+        date format: YYYY-MM-DD
+        """
+        if self._use_csv(start_date, end_date):
+            return self._frame_to_records(
+                self._fetch_daily_csv(lat, lon, start_date, end_date), lat, lon
+            )
+        data = self._fetch_daily(lat, lon, start_date, end_date)
+        return self._parse_daily_data(data, lat, lon)
+    
+    def extract_historical_df(self, 
+                             lat: float, 
+                             lon: float, 
+                             start_date: str,
+                             end_date: str) -> pd.DataFrame:
+        """
+        Extract historical weather data as a columnar DataFrame
+        Columns: date + FIELD_MAP keys, missing values as NaN
+        """
+        if self._use_csv(start_date, end_date):
+            return self._fetch_daily_csv(lat, lon, start_date, end_date)
+        data = self._fetch_daily(lat, lon, start_date, end_date)
+        return self._daily_frame(data)
+    
+    def _daily_frame(self, data: Dict) -> pd.DataFrame:
+        """Build one column per daily variable from the parallel API arrays"""
         daily = data.get("daily", {})
         dates = daily.get("time", [])
+        n = len(dates)
         
-        results = []
-        for i, date in enumerate(dates):
-            weather = WeatherData(
-                latitude=lat,
-                longitude=lon,
-                date=date,
-                temp_max=self._safe_get(daily.get("temperature_2m_max"), i),
-                temp_min=self._safe_get(daily.get("temperature_2m_min"), i),
-                temp_mean=self._safe_get(daily.get("temperature_2m_mean"), i),
-                precipitation=self._safe_get(daily.get("precipitation_sum"), i),
-                evapotranspiration=self._safe_get(daily.get("et0_fao_evapotranspiration"), i),
-                solar_radiation=self._safe_get(daily.get("shortwave_radiation_sum"), i),
-                humidity=self._safe_get(daily.get("relative_humidity_2m_mean"), i),
-                wind_speed=self._safe_get(daily.get("wind_speed_10m_max"), i),
-                weather_code=self._safe_get(daily.get("weather_code"), i)
-            )
-            results.append(weather)
+        columns = {"date": dates}
+        for field, api_name in self.FIELD_MAP.items():
+            values = daily.get(api_name) or []
+            column = np.full(n, np.nan)
+            m = min(n, len(values))
+            column[:m] = np.asarray(values[:m], dtype=np.float64)  # None -> NaN
+            columns[field] = column
         
-        return results
+        frame = pd.DataFrame(columns)
+        frame["weather_code"] = frame["weather_code"].astype("Int64")
+        return frame
+    
+    def _parse_daily_data(self, data: Dict, lat: float, lon: float) -> List[WeatherData]:
+        """Parse Open-Meteo daily response"""
+        return self._frame_to_records(self._daily_frame(data), lat, lon)
     
     @staticmethod
-    def _safe_get(arr, idx, default=None):
-        if arr and len(arr) > idx:
-            val = arr[idx]
-            return val if val is not None else default
-        return default
+    def _frame_to_records(frame: pd.DataFrame, lat: float, lon: float) -> List[WeatherData]:
+        """Materialize WeatherData rows from a daily frame"""
+        # Back to Python scalars, with None for gaps
+        frame = frame.astype(object).where(frame.notna(), None)
+        
+        return [
+            WeatherData(lat, lon, *row)
+            for row in frame.itertuples(index=False, name=None)
+        ]
     
     def extract_forecast(self, lat: float, lon: float, days: int = 7) -> List[WeatherData]:
         """Extract forecast data (for near-real-time updates)"""
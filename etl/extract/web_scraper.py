@@ -1,8 +1,10 @@
 # etl/extract/web_scraper.py
 import requests
-from bs4 import BeautifulSoup
+from lxml import html as lxml_html
 import time
 import re
+import hashlib
+from functools import partial
 from typing import List, Dict, Optional
 from dataclasses import dataclass
 from urllib.parse import urljoin, urlparse
@@ -10,6 +12,31 @@ import xml.etree.ElementTree as ET
 
 from etl.config import ETLConfig
 from etl.utils.logger import ETLLogger
+from etl.extract.session import build_http_session
+
+# Whitespace collapsing applied to every scraped page
+_RE_NEWLINES = re.compile(r'\n+')
+_RE_SPACES = re.compile(r' +')
+
+# USDA page title, read straight from the raw bytes
+_TITLE_RE = re.compile(rb'<title[^>]*>([^<]*)</title>', re.I)
+
+# Main content container on FAO pages (class token match, like CSS div.content)
+_XPATH_CONTENT = "//div[contains(concat(' ', normalize-space(@class), ' '), ' content ')]"
+_XPATH_NOISE = ".//script|.//style|.//nav|.//footer|.//comment()"
+
+def _parse_html(response: requests.Response):
+    """Parse a response body with lxml, using the charset requests resolved"""
+    parser = lxml_html.HTMLParser(encoding=response.encoding or response.apparent_encoding)
+    return lxml_html.document_fromstring(response.content, parser=parser)
+
+def _url_fingerprint(url: str) -> bytes:
+    """Fixed 8-byte digest of a URL (collisions negligible at scrape scale)"""
+    return hashlib.blake2b(url.encode(), digest_size=8).digest()
+
+def _node_text(node, separator: str) -> str:
+    """Join the stripped, non-empty text fragments of an lxml subtree"""
+    return separator.join(t.strip() for t in node.itertext() if t.strip())
 
 @dataclass
 class CropRequirementSource:
@@ -53,81 +80,85 @@ class CropRequirementScraper:
         }
     }
     
-    def __init__(self, config: ETLConfig, logger: ETLLogger):
+    # Crop -> absolute FAO page URL, resolved once at import
+    _FAO_URLS = dict(zip(
+        SOURCES["fao"]["crop_pages"],
+        map(partial(urljoin, SOURCES["fao"]["base_url"]), SOURCES["fao"]["crop_pages"].values())
+    ))
+    _FAO_RELIABILITY = SOURCES["fao"]["reliability"]
+    
+    def __init__(self, config: ETLConfig, logger: ETLLogger,
+                 session: Optional[requests.Session] = None):
         self.config = config
         self.logger = logger
-        self.session = requests.Session()
-        self.session.headers.update({
+        # Session may be shared with the API extractors, so headers are
+        # sent per request rather than set on the session
+        self.session = session or build_http_session(config)
+        self.headers = {
             "User-Agent": config.scraping.user_agent,
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
             "Accept-Language": "en-US,en;q=0.5",
-            "Accept-Encoding": "gzip, deflate",
             "Connection": "keep-alive",
-        })
+        }
+        # Fingerprints rather than full URL strings keep memory per entry fixed
         self.visited_urls = set()
     
     def _respectful_request(self, url: str) -> Optional[requests.Response]:
-        """Make a respectful request with retries"""
-        for attempt in range(self.config.scraping.max_retries):
-            try:
-                response = self.session.get(
-                    url, 
-                    timeout=self.config.scraping.timeout,  # Changed from self.config.timeout
-                    headers={'User-Agent': self.config.scraping.user_agent}  # Changed from self.config.user_agent
-                )
-                
-                # Specifically handle 404 errors
-                if response.status_code == 404:
-                    self.logger.logger.warning(f"URL not found (404), skipping: {url}")
-                    return None
-                
-                response.raise_for_status()
-                return response
-                
-            except requests.exceptions.HTTPError as e:
-                if attempt == self.config.scraping.max_retries - 1:  # Changed from self.config.max_retries
-                    raise
-                time.sleep(self.config.scraping.request_delay * (attempt + 1))  # Changed from self.config.request_delay
-        
-        return None
+        """Make a respectful request (retries handled by the session adapter)"""
+        fingerprint = _url_fingerprint(url)
+        if fingerprint in self.visited_urls:
+            self.logger.logger.debug(f"Already visited, skipping: {url}")
+            return None
+        
+        response = self.session.get(
+            url, 
+            timeout=self.config.scraping.timeout,
+            headers=self.headers
+        )
+        
+        # Specifically handle 404 errors
+        if response.status_code == 404:
+            self.logger.logger.warning(f"URL not found (404), skipping: {url}")
+            return None
+        
+        response.raise_for_status()
+        # Only successful fetches count as visited; failures may be retried later
+        self.visited_urls.add(fingerprint)
+        return response
     
     def scrape_fao_crop_profile(self, crop_name: str) -> Optional[CropRequirementSource]:
         """Scrape FAO crop profile page"""
-        source_config = self.SOURCES["fao"]
-        if crop_name.lower() not in source_config["crop_pages"]:
+        url = self._FAO_URLS.get(crop_name.lower())
+        if url is None:
             return None
         
-        url = urljoin(source_config["base_url"], 
-                     source_config["crop_pages"][crop_name.lower()])
-        
         html = self._respectful_request(url)
         if not html:
             return None
         
-        soup = BeautifulSoup(html.text, 'html.parser')
+        tree = _parse_html(html)
         
         # FAO documents typically have content in div with class 'content' or article tags
-        content_div = soup.find('div', class_='content') or soup.find('article')
-        if not content_div:
-            content_div = soup.find('body')
+        content_nodes = tree.xpath(_XPATH_CONTENT) or tree.xpath('//article')
+        content_div = content_nodes[0] if content_nodes else tree.body
         
         # Remove script and style elements
-        for script in content_div.find_all(['script', 'style', 'nav', 'footer']):
-            script.decompose()
+        for node in content_div.xpath(_XPATH_NOISE):
+            node.drop_tree()
         
         # Extract text while preserving some structure
-        raw_text = content_div.get_text(separator='\n', strip=True)
+        raw_text = _node_text(content_div, '\n')
         
         # Clean up excessive whitespace
-        raw_text = re.sub(r'\n+', '\n', raw_text)
-        raw_text = re.sub(r' +', ' ', raw_text)
+        raw_text = _RE_NEWLINES.sub('\n', raw_text)
+        raw_text = _RE_SPACES.sub(' ', raw_text)
         
         return CropRequirementSource(
             crop_name=crop_name,
             source_url=url,
             raw_text=raw_text,
             extracted_date=time.strftime("%Y-%m-%d"),
-            reliability_score=source_config["reliability"]
+            reliability_score=self._FAO_RELIABILITY
         )
     
     def scrape_usda_plants(self, symbol: str) -> Optional[CropRequirementSource]:
@@ -139,23 +170,23 @@ class CropRequirementScraper:
         if not html:
             return None
         
-        soup = BeautifulSoup(html, 'html.parser')
+        tree = _parse_html(html)
         
         # USDA plants typically has characteristics in definition lists or tables
         characteristics = []
         
         # Look for growth requirements sections
-        dl_elements = soup.find_all('dl')
-        for dl in dl_elements:
-            characteristics.append(dl.get_text(separator=' ', strip=True))
+        for dl in tree.iter('dl'):
+            characteristics.append(_node_text(dl, ' '))
         
         raw_text = "\n".join(characteristics)
         
         # Try to find crop name from title
-        title = soup.find('title')
+        match = _TITLE_RE.search(html.content)
         crop_name = symbol
-        if title:
-            crop_name = title.get_text().split('-')[0].strip()
+        if match:
+            title = match.group(1).decode(html.encoding or 'utf-8', errors='replace')
+            crop_name = title.split('-')[0].strip() or symbol
         
         return CropRequirementSource(
             crop_name=crop_name,
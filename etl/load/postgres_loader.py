@@ -1,20 +1,80 @@
 # etl/load/postgres_loader.py
 from typing import List, Dict, Any, Optional
-from psycopg2.extras import execute_values
+from datetime import datetime
+from psycopg2.extras import RealDictCursor
 from etl.utils.database import PostgresManager
 from etl.utils.logger import ETLLogger
 from etl.config import ETLConfig
 
+def _on_conflict(key: tuple, columns: tuple) -> str:
+    """ON CONFLICT clause refreshing every non-key column from EXCLUDED"""
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c not in key)
+    return f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}"
+
+# Loaded columns per target, in row-tuple order
+_SOIL_COLS = (
+    'location_key', 'soil_texture', 'clay_content_0_5cm', 'sand_content_0_5cm',
+    'silt_content_0_5cm', 'ph_level_0_5cm', 'organic_carbon_0_5cm',
+    'bulk_density_0_5cm', 'water_capacity_0_5cm', 'soil_depth_cm',
+    'extraction_date', 'metadata'
+)
+_WEATHER_COLS = (
+    'location_key', 'date_key', 'latitude', 'longitude', 'temp_max_c',
+    'temp_min_c', 'temp_mean_c', 'precipitation_mm', 'evapotranspiration_mm',
+    'solar_radiation_mj_m2', 'humidity_percent', 'wind_speed_ms',
+    'weather_code'
+)
+# Staging types for binary COPY of weather rows (cast to DECIMAL on insert)
+_WEATHER_TYPES = ('int4', 'int4') + ('float8',) * 10 + ('int4',)
+_CROP_COLS = (
+    'crop_name', 'optimal_temp_min_c', 'optimal_temp_max_c',
+    'water_requirement_mm_day', 'sunlight_hours_min', 'sunlight_hours_max',
+    'soil_ph_preference_min', 'soil_ph_preference_max',
+    'extraction_confidence', 'extraction_date', 'source_urls'
+)
+
+_INSERT_LOCATIONS_SQL = """
+    INSERT INTO dim_location (
+        latitude, longitude, country_code, country_name,
+        admin_region, location_hash, effective_date
+    ) VALUES %s
+    ON CONFLICT (location_hash) DO NOTHING
+    RETURNING location_hash, location_key;
+"""
+_PREPARE_LOCATION_SQL = """
+    PREPARE dim_location_ins (numeric, numeric, text, text, text, text) AS
+    INSERT INTO dim_location (
+        latitude, longitude, country_code, country_name,
+        admin_region, location_hash, effective_date
+    ) VALUES ($1, $2, $3, $4, $5, $6, CURRENT_DATE)
+    ON CONFLICT (location_hash) DO NOTHING
+    RETURNING location_hash, location_key;
+"""
+
+_SOIL_CONFLICT = _on_conflict(('location_key', 'extraction_date'), _SOIL_COLS)
+_WEATHER_KEY = ('date_key', 'location_key')
+_WEATHER_CONFLICT = _on_conflict(_WEATHER_KEY, _WEATHER_COLS + ('batch_id',))
+# Crop rows (CropRow tuples) are bound positionally
+_CROP_TEMPLATE = "(" + ", ".join(["%s"] * len(_CROP_COLS)) + ")"
+_UPSERT_CROP_SQL = (
+    f"INSERT INTO dim_crop ({', '.join(_CROP_COLS)}) VALUES %s "
+    + _on_conflict(('crop_name',), _CROP_COLS)
+)
+
 class WarehouseLoader:
     """
     Idempotent loader for data warehouse
     Implements upsert patterns and transaction management
     """
     
-    def __init__(self, db_manager: PostgresManager, logger: ETLLogger, batch_id: str):
+    def __init__(self, db_manager: PostgresManager, logger: ETLLogger, batch_id: str,
+                 pipeline_name: Optional[str] = None):
         self.db = db_manager
         self.logger = logger
         self.batch_id = batch_id
+        # Audit row is written once, at completion
+        self.pipeline_name = pipeline_name or batch_id
+        self.started_at = datetime.now()
     
     def load_locations(self, locations: List[Dict]) -> Dict[int, int]:
         """
@@ -24,151 +84,132 @@ class WarehouseLoader:
         if not locations:
             return {}
         
-        location_map = {}
+        # One row per hash: a statement may not insert the same row twice.
+        # Sent in hash order so index probes and inserts touch pages sequentially
+        unique = {loc['location_hash']: loc for loc in locations}
+        unique = dict(sorted(unique.items()))
         
-        for loc in locations:
-            lat, lon = loc['latitude'], loc['longitude']
-            loc_hash = loc['location_hash']
-            
-            # Check if location exists and is current
-            existing = self.db.fetch_one(
-                "SELECT location_key FROM dim_location WHERE location_hash = %s AND is_current = TRUE",
-                (loc_hash,)
-            )
-            
-            if existing:
-                location_map[loc_hash] = existing['location_key']
-                continue
-            
-            # Insert new location
-            query = """
-                INSERT INTO dim_location (
-                    latitude, longitude, country_code, country_name,
-                    admin_region, location_hash, effective_date
-                ) VALUES (
-                    %(latitude)s, %(longitude)s, %(country_code)s, %(country_name)s,
-                    %(admin_region)s, %(location_hash)s, CURRENT_DATE
+        try:
+            # Known locations in one lookup, so only new ones are written
+            with self.db.savepoint():
+                existing = self.db.fetch_many(
+                    "SELECT location_hash, location_key FROM dim_location "
+                    "WHERE location_hash = ANY(%s) AND is_current = TRUE",
+                    (list(unique),)
                 )
-                RETURNING location_key;
-            """
-            
-            try:
-                result = self.db.fetch_one(query, loc)
-                if result:
-                    location_map[loc_hash] = result['location_key']
-                    self.logger.log_load("dim_location", 1)
-            except Exception as e:
-                self.logger.log_error(e, f"Loading location ({lat}, {lon})")
+        except Exception as e:
+            self.logger.log_error(e, f"Looking up {len(unique)} locations")
+            return {}
+        
+        location_map = {r['location_hash']: r['location_key'] for r in existing}
+        
+        missing = [loc for h, loc in unique.items() if h not in location_map]
+        if not missing:
+            return location_map
         
+        values = [(
+            loc['latitude'], loc['longitude'], loc['country_code'],
+            loc['country_name'], loc['admin_region'], loc['location_hash']
+        ) for loc in missing]
+        
+        try:
+            with self.db.savepoint():
+                inserted = self.db.fetch_batch(
+                    _INSERT_LOCATIONS_SQL, values,
+                    template="(%s, %s, %s, %s, %s, %s, CURRENT_DATE)", page_size=500
+                )
+        except Exception as e:
+            # One bad row fails the whole statement; retry row by row to keep the rest
+            self.logger.log_error(e, f"Bulk loading {len(values)} locations")
+            inserted = self._insert_locations_row_by_row(values)
+        
+        if inserted:
+            self.logger.log_load("dim_location", len(inserted))
+        
+        location_map.update((r['location_hash'], r['location_key']) for r in inserted)
         return location_map
     
-    def load_soil_data(self, soil_records: List[Dict]) -> int:
-        """Load soil dimension records"""
+    def _insert_locations_row_by_row(self, values: List[tuple]) -> List[Dict]:
+        """
+        Fallback insert: one prepared statement, executed per location
+        Each row runs under its own savepoint, so failures are logged and skipped.
+        """
+        inserted = []
+        with self.db.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(_PREPARE_LOCATION_SQL)
+            try:
+                for row in values:
+                    cur.execute("SAVEPOINT location_row")
+                    try:
+                        cur.execute("EXECUTE dim_location_ins (%s, %s, %s, %s, %s, %s)", row)
+                        result = cur.fetchone()
+                        cur.execute("RELEASE SAVEPOINT location_row")
+                    except Exception as e:
+                        cur.execute("ROLLBACK TO SAVEPOINT location_row")
+                        self.logger.log_error(e, f"Loading location ({row[0]}, {row[1]})")
+                        continue
+                    if result:
+                        inserted.append(result)
+            finally:
+                # Prepared statements outlive the transaction on pooled connections
+                cur.execute("DEALLOCATE dim_location_ins")
+        return inserted
+    
+    def load_soil_data(self, soil_records: List[tuple]) -> int:
+        """Load soil dimension rows (DataTransformer.transform_soil, _SOIL_COLS order)"""
         if not soil_records:
             return 0
         
-        query = """
-            INSERT INTO dim_soil (
-                location_key, soil_texture, clay_content_0_5cm, sand_content_0_5cm,
-                silt_content_0_5cm, ph_level_0_5cm, organic_carbon_0_5cm,
-                bulk_density_0_5cm, water_capacity_0_5cm, soil_depth_cm,
-                extraction_date, metadata
-            ) VALUES %s
-            ON CONFLICT (location_key, extraction_date) DO UPDATE SET
-                soil_texture = EXCLUDED.soil_texture,
-                ph_level_0_5cm = EXCLUDED.ph_level_0_5cm,
-                metadata = EXCLUDED.metadata;
-        """
-        
-        values = [(
-            r['location_key'], r['soil_texture'], r['clay_content_0_5cm'],
-            r['sand_content_0_5cm'], r['silt_content_0_5cm'], r['ph_level_0_5cm'],
-            r['organic_carbon_0_5cm'], r['bulk_density_0_5cm'],
-            r['water_capacity_0_5cm'], r['soil_depth_cm'],
-            r['extraction_date'], r['metadata']
-        ) for r in soil_records]
-        
         try:
-            self.db.execute_batch(query, values)
+            with self.db.savepoint():
+                self.db.copy_upsert("dim_soil", _SOIL_COLS, soil_records, _SOIL_CONFLICT)
             self.logger.log_load("dim_soil", len(soil_records))
             return len(soil_records)
         except Exception as e:
             self.logger.log_error(e, "Bulk loading soil data")
             return 0
     
-    def load_weather_data(self, weather_records: List[Dict]) -> int:
+    def load_weather_data(self, weather_records: List[tuple]) -> int:
         """
-        Load weather fact data with idempotency check
+        Load weather fact rows (DataTransformer.transform_weather)
         Uses batch_id for traceability
         """
-        if not weather_records:
-            return 0
-        
-        # Add batch_id to all records
-        for record in weather_records:
-            record['batch_id'] = self.batch_id
-        
-        query = """
-            INSERT INTO fact_weather (
-                location_key, date_key, latitude, longitude, temp_max_c,
-                temp_min_c, temp_mean_c, precipitation_mm, evapotranspiration_mm,
-                solar_radiation_mj_m2, humidity_percent, wind_speed_ms,
-                weather_code, batch_id
-            ) VALUES %s
-            ON CONFLICT (date_key, location_key) DO UPDATE SET
-                temp_max_c = EXCLUDED.temp_max_c,
-                temp_min_c = EXCLUDED.temp_min_c,
-                temp_mean_c = EXCLUDED.temp_mean_c,
-                precipitation_mm = EXCLUDED.precipitation_mm,
-                batch_id = EXCLUDED.batch_id;
+        return self.load_weather_rows(weather_records)
+    
+    def load_weather_rows(self, rows: List[tuple]) -> int:
         """
-        
-        values = [(
-            r['location_key'], r['date_key'], r['latitude'], r['longitude'],
-            r['temp_max_c'], r['temp_min_c'], r['temp_mean_c'],
-            r['precipitation_mm'], r['evapotranspiration_mm'],
-            r['solar_radiation_mj_m2'], r['humidity_percent'],
-            r['wind_speed_ms'], r['weather_code'], r['batch_id']
-        ) for r in weather_records]
+        Load pre-packed fact_weather tuples (see DataTransformer.transform_weather_batch)
+        or a WEATHER_DTYPE array (DataTransformer.transform_weather_array)
+        Rows are stamped with this loader's batch_id for traceability
+        """
+        if not len(rows):
+            return 0
         
         try:
-            self.db.execute_batch(query, values, page_size=1000)
-            self.logger.log_load("fact_weather", len(weather_records))
-            return len(weather_records)
+            # batch_id is bound once in the INSERT ... SELECT, not copied per row
+            constants = {'batch_id': self.batch_id}
+            with self.db.savepoint():
+                if self.db.config.weather_explicit_upsert:
+                    self.db.copy_merge("fact_weather", _WEATHER_COLS, _WEATHER_KEY, rows,
+                                       constants=constants, types=_WEATHER_TYPES)
+                else:
+                    self.db.copy_upsert("fact_weather", _WEATHER_COLS, rows, _WEATHER_CONFLICT,
+                                        constants=constants, types=_WEATHER_TYPES)
+            self.logger.log_load("fact_weather", len(rows))
+            return len(rows)
         except Exception as e:
             self.logger.log_error(e, "Bulk loading weather data")
             return 0
     
-    def load_crop_requirements(self, crop_records: List[Dict]) -> int:
+    def load_crop_requirements(self, crop_records: List[tuple]) -> int:
         """Load crop dimension with conflict handling"""
         if not crop_records:
             return 0
         
-        query = """
-            INSERT INTO dim_crop (
-                crop_name, optimal_temp_min_c, optimal_temp_max_c,
-                water_requirement_mm_day, sunlight_hours_min, sunlight_hours_max,
-                soil_ph_preference_min, soil_ph_preference_max,
-                extraction_confidence, extraction_date, source_urls
-            ) VALUES %s
-            ON CONFLICT (crop_name) DO UPDATE SET
-                optimal_temp_min_c = EXCLUDED.optimal_temp_min_c,
-                optimal_temp_max_c = EXCLUDED.optimal_temp_max_c,
-                water_requirement_mm_day = EXCLUDED.water_requirement_mm_day,
-                extraction_confidence = EXCLUDED.extraction_confidence,
-                extraction_date = EXCLUDED.extraction_date;
-        """
-        
-        values = [(
-            r['crop_name'], r['optimal_temp_min_c'], r['optimal_temp_max_c'],
-            r['water_requirement_mm_day'], r['sunlight_hours_min'],
-            r['sunlight_hours_max'], r['soil_ph_preference_min'],
-            r['soil_ph_preference_max'], r['extraction_confidence'],
-            r['extraction_date'], r['source_urls']
-        ) for r in crop_records]
-        
         try:
-            self.db.execute_batch(query, values)
+            with self.db.savepoint():
+                self.db.execute_values(_UPSERT_CROP_SQL, crop_records,
+                                       template=_CROP_TEMPLATE, page_size=500)
             self.logger.log_load("dim_crop", len(crop_records))
             return len(crop_records)
         except Exception as e:
@@ -176,15 +217,21 @@ class WarehouseLoader:
             return 0
     
     def audit_completion(self, status: str, records_processed: int, error_msg: Optional[str] = None):
-        """Write audit log entry"""
+        """Write the audit log entry for this batch (single upsert)"""
         query = """
-            UPDATE etl_audit_log 
-            SET end_time = CURRENT_TIMESTAMP,
-                status = %s,
-                records_processed = %s,
-                error_message = %s
-            WHERE batch_id = %s;
+            INSERT INTO etl_audit_log (
+                batch_id, pipeline_name, start_time, end_time,
+                status, records_processed, error_message
+            ) VALUES (%s, %s, %s, CURRENT_TIMESTAMP, %s, %s, %s)
+            ON CONFLICT (batch_id) DO UPDATE SET
+                end_time = EXCLUDED.end_time,
+                status = EXCLUDED.status,
+                records_processed = EXCLUDED.records_processed,
+                error_message = EXCLUDED.error_message;
         """
-        # Utiliser execute simple pour un seul UPDATE
+        # Utiliser execute simple pour un seul enregistrement
         with self.db.cursor() as cur:
-            cur.execute(query, (status, records_processed, error_msg, self.batch_id))
\ No newline at end of file
+            cur.execute(query, (
+                self.batch_id, self.pipeline_name, self.started_at,
+                status, records_processed, error_msg
+            ))
\ No newline at end of file
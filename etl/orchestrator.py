@@ -4,10 +4,13 @@ import argparse
 from datetime import datetime, timedelta
 from typing import List, Tuple
 import json
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from etl.config import ETLConfig
+from etl.config import get_config
 from etl.utils.logger import ETLLogger
 from etl.utils.database import PostgresManager
+from etl.extract.session import build_http_session
 from etl.extract.soil_api import SoilGridsExtractor, SoilData
 from etl.extract.weather_api import OpenMeteoExtractor, WeatherData
 from etl.extract.web_scraper import CropRequirementScraper
@@ -22,59 +25,70 @@ class ETLPipeline:
     """
     
     def __init__(self):
-        self.config = ETLConfig()
+        self.config = get_config()
         self.logger = ETLLogger("etl_orchestrator")
         self.db = PostgresManager(self.config)
         self.transformer = DataTransformer()
+        # One pooled HTTP session shared by every extractor
+        self.http_session = build_http_session(self.config)
         
     def run_soil_pipeline(self, coordinates: List[Tuple[float, float]]) -> int:
         """Execute soil data ETL"""
         batch_id = self.logger.start_batch("soil_pipeline")
-        self._init_audit(batch_id, "soil_extraction")
+        loader = WarehouseLoader(self.db, self.logger, batch_id, "soil_extraction")
         
         try:
-            # Extract
-            extractor = SoilGridsExtractor(self.config, self.logger)
-            soil_data = extractor.extract(coordinates)
+            extractor = SoilGridsExtractor(self.config, self.logger, self.http_session)
+            coords = extractor.valid_coordinates(coordinates)
             
-            if not soil_data:
-                self._complete_audit(batch_id, "SUCCESS", 0)
-                return 0
+            # Hash each coordinate once for both passes below
+            hashes = {
+                (lat, lon): self.transformer.generate_location_hash(lat, lon)
+                for lat, lon in coords
+            }
             
             # Transform locations first
             locations = []
-            for sd in soil_data:
-                loc_hash = self.transformer.generate_location_hash(sd.latitude, sd.longitude)
+            for (lat, lon), loc_hash in hashes.items():
                 locations.append({
-                    'latitude': sd.latitude,
-                    'longitude': sd.longitude,
+                    'latitude': lat,
+                    'longitude': lon,
                     'country_code': None,  # Would need reverse geocoding
                     'country_name': None,
                     'admin_region': None,
                     'location_hash': loc_hash
                 })
             
-            # Load
-            loader = WarehouseLoader(self.db, self.logger, batch_id)
-            location_map = loader.load_locations(locations)
+            # Short transactions around the writes only: no connection sits idle
+            # in transaction while SoilGrids is polled. The audit commits on its own.
+            with self.db.transaction():
+                # Load
+                location_map = loader.load_locations(locations)
             
-            # Transform and load soil data
+            # Extract, transform and load soil data as it streams in,
+            # config.batch_size records at a time (one transaction per flush)
+            loaded = 0
             soil_records = []
-            for sd in soil_data:
-                loc_hash = self.transformer.generate_location_hash(sd.latitude, sd.longitude)
-                loc_key = location_map.get(loc_hash)
+            for sd in extractor.iter_extract(coords):
+                loc_key = location_map.get(hashes[(sd.latitude, sd.longitude)])
                 if loc_key:
-                    record = self.transformer.transform_soil(sd, loc_key)
-                    soil_records.append(record)
+                    soil_records.append(self.transformer.transform_soil(sd, loc_key))
+                
+                if len(soil_records) >= self.config.batch_size:
+                    with self.db.transaction():
+                        loaded += loader.load_soil_data(soil_records)
+                    soil_records = []
+            
+            if soil_records:
+                with self.db.transaction():
+                    loaded += loader.load_soil_data(soil_records)
             
-            loaded = loader.load_soil_data(soil_records)
             loader.audit_completion("SUCCESS", loaded)
             
             return loaded
             
         except Exception as e:
             self.logger.log_error(e, "Soil pipeline failure")
-            loader = WarehouseLoader(self.db, self.logger, batch_id)
             loader.audit_completion("FAILED", 0, str(e))
             raise
     
@@ -84,62 +98,88 @@ class ETLPipeline:
                             end_date: str) -> int:
         """Execute weather data ETL"""
         batch_id = self.logger.start_batch("weather_pipeline")
-        self._init_audit(batch_id, "weather_extraction")
+        loader = WarehouseLoader(self.db, self.logger, batch_id, "weather_extraction")
         
         try:
-            extractor = OpenMeteoExtractor(self.config, self.logger)
-            loader = WarehouseLoader(self.db, self.logger, batch_id)
+            extractor = OpenMeteoExtractor(self.config, self.logger, self.http_session)
+            
+            # Hash each coordinate once for both passes below
+            hashes = {
+                (lat, lon): self.transformer.generate_location_hash(lat, lon)
+                for lat, lon in coordinates
+            }
             
             # Ensure locations exist
             locations = []
-            for lat, lon in coordinates:
-                loc_hash = self.transformer.generate_location_hash(lat, lon)
+            for (lat, lon), loc_hash in hashes.items():
                 locations.append({
                     'latitude': lat, 'longitude': lon,
                     'location_hash': loc_hash,
                     'country_code': None, 'country_name': None, 'admin_region': None
                 })
             
-            location_map = loader.load_locations(locations)
+            # Short transactions around the writes only: no connection sits idle
+            # in transaction while the API is polled. The audit commits on its own.
+            with self.db.transaction():
+                location_map = loader.load_locations(locations)
+            
+            # Extract request batches concurrently; a single loader drains
+            # the results and writes them in config.batch_size COPY batches
+            # One coordinate per location: duplicates (or points equal to 1e-6) share a
+            # location_key and would put the same (date_key, location_key) twice in a batch
+            representatives = {}
+            for coord, loc_hash in hashes.items():
+                representatives.setdefault(loc_hash, coord)
+            unique_coords = list(representatives.values())
+            step = self.config.api.weather_batch_size
+            chunks = [unique_coords[i:i + step] for i in range(0, len(unique_coords), step)]
             
             total_loaded = 0
-            for lat, lon in coordinates:
-                # Extract
-                weather_data = extractor.extract_historical(lat, lon, start_date, end_date)
-                
-                # Transform
-                loc_hash = self.transformer.generate_location_hash(lat, lon)
-                loc_key = location_map.get(loc_hash)
-                
-                if not loc_key:
-                    continue
-                
-                weather_records = [
-                    self.transformer.transform_weather(wd, loc_key)
-                    for wd in weather_data
+            buffer, buffered = [], 0
+            with ThreadPoolExecutor(max_workers=min(self.config.api.max_workers, len(chunks) or 1)) as pool:
+                futures = [
+                    pool.submit(extractor.extract_historical_batch, chunk, start_date, end_date)
+                    for chunk in chunks
                 ]
                 
-                # Load
-                loaded = loader.load_weather_data(weather_records)
-                total_loaded += loaded
+                for future in as_completed(futures):
+                    for (lat, lon), weather_data in future.result().items():
+                        # Transform
+                        loc_key = location_map.get(hashes[(lat, lon)])
+                        
+                        if not loc_key:
+                            continue
+                        
+                        rows = self.transformer.transform_weather_array(weather_data, loc_key)
+                        buffer.append(rows)
+                        buffered += len(rows)
+                    
+                    # Load (one transaction per flushed batch)
+                    if buffered >= self.config.batch_size:
+                        with self.db.transaction():
+                            total_loaded += loader.load_weather_rows(np.concatenate(buffer))
+                        buffer, buffered = [], 0
+            
+            if buffered:
+                with self.db.transaction():
+                    total_loaded += loader.load_weather_rows(np.concatenate(buffer))
             
             loader.audit_completion("SUCCESS", total_loaded)
             return total_loaded
             
         except Exception as e:
             self.logger.log_error(e, "Weather pipeline failure")
-            loader = WarehouseLoader(self.db, self.logger, batch_id)
             loader.audit_completion("FAILED", 0, str(e))
             raise
     
     def run_crop_pipeline(self, crop_list: List[str]) -> int:
         """Execute crop requirements ETL with NLP"""
         batch_id = self.logger.start_batch("crop_pipeline")
-        self._init_audit(batch_id, "crop_extraction")
+        loader = WarehouseLoader(self.db, self.logger, batch_id, "crop_extraction")
         
         try:
             # Extract
-            scraper = CropRequirementScraper(self.config, self.logger)
+            scraper = CropRequirementScraper(self.config, self.logger, self.http_session)
             sources = scraper.scrape_multiple_crops(crop_list)
             
             # Transform (NLP)
@@ -153,7 +193,6 @@ class ETLPipeline:
             ]
             
             # Load
-            loader = WarehouseLoader(self.db, self.logger, batch_id)
             loaded = loader.load_crop_requirements(crop_records)
             
             loader.audit_completion("SUCCESS", loaded)
@@ -161,20 +200,9 @@ class ETLPipeline:
             
         except Exception as e:
             self.logger.log_error(e, "Crop pipeline failure")
-            loader = WarehouseLoader(self.db, self.logger, batch_id)
             loader.audit_completion("FAILED", 0, str(e))
             raise
     
-    def _init_audit(self, batch_id: str, pipeline_name: str):
-        """Initialize audit record"""
-        query = """
-            INSERT INTO etl_audit_log (batch_id, pipeline_name, start_time, status)
-            VALUES (%s, %s, CURRENT_TIMESTAMP, 'RUNNING');
-        """
-        # Utiliser execute simple pour un seul enregistrement
-        with self.db.cursor() as cur:
-            cur.execute(query, (batch_id, pipeline_name))
-    
     def run_full_pipeline(self, 
                          coordinates: List[Tuple[float, float]],
                          crops: List[str],
@@ -237,16 +265,20 @@ def main():
     start = args.start_date or (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
     end = args.end_date or datetime.now().strftime('%Y-%m-%d')
     
+    get_config().setup_logging()
     pipeline = ETLPipeline()
     
-    if args.mode == 'soil':
-        pipeline.run_soil_pipeline(coords)
-    elif args.mode == 'weather':
-        pipeline.run_weather_pipeline(coords, start, end)
-    elif args.mode == 'crop':
-        pipeline.run_crop_pipeline(crops)
-    else:
-        pipeline.run_full_pipeline(coords, crops, start, end)
+    try:
+        if args.mode == 'soil':
+            pipeline.run_soil_pipeline(coords)
+        elif args.mode == 'weather':
+            pipeline.run_weather_pipeline(coords, start, end)
+        elif args.mode == 'crop':
+            pipeline.run_crop_pipeline(crops)
+        else:
+            pipeline.run_full_pipeline(coords, crops, start, end)
+    finally:
+        pipeline.db.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -4,13 +4,79 @@ Data Cleaning and Preprocessing Utilities
 """
 
 import re
+import string
 import unicodedata
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 import pandas as pd
 import numpy as np
 
 
+def _union_pattern(replacements: Dict[str, str]):
+    """
+    Compile replacements into one case-insensitive, word-bounded alternation
+    Keys are grouped under their leading character (t(?:emp|...)|m(?:ax|...)),
+    so each position is dispatched on one literal instead of trying every key.
+    Keys are tried longest first within a group. Each key's tail is its own
+    group, so the replacement is looked up by m.lastindex; see _substitute.
+    """
+    groups: Dict[str, List[str]] = {}
+    for key in sorted(replacements, key=len, reverse=True):
+        groups.setdefault(key[0].lower(), []).append(key)
+    
+    branches, values = [], [None]
+    for first, keys in groups.items():
+        branches.append(
+            re.escape(first) + '(?:' + '|'.join(f'({re.escape(k[1:])})' for k in keys) + ')'
+        )
+        values.extend(replacements[k] for k in keys)
+    pattern = re.compile(r'\b(?:' + '|'.join(branches) + r')\b', re.IGNORECASE)
+    return pattern, values
+
+
+def _substitute(union, text: str) -> str:
+    """Apply a _union_pattern result to text in a single scan"""
+    pattern, values = union
+    return pattern.sub(lambda m: values[m.lastindex], text)
+
+
+# Common crop name mappings
+_CROP_NAME_MAP = MappingProxyType({
+    'maize': 'Maize',
+    'corn': 'Maize',
+    'zea mays': 'Maize',
+    'wheat': 'Wheat',
+    'triticum': 'Wheat',
+    'bread wheat': 'Wheat',
+    'durum wheat': 'Wheat',
+    'rice': 'Rice',
+    'oryza sativa': 'Rice',
+    'paddy': 'Rice',
+    'soybean': 'Soybean',
+    'soy': 'Soybean',
+    'glycine max': 'Soybean',
+    'soya': 'Soybean',
+    'potato': 'Potato',
+    'solanum tuberosum': 'Potato',
+    'irish potato': 'Potato',
+    'tomato': 'Tomato',
+    'solanum lycopersicum': 'Tomato',
+    'barley': 'Barley',
+    'hordeum vulgare': 'Barley',
+    'cotton': 'Cotton',
+    'gossypium': 'Cotton',
+})
+
+
+@lru_cache(maxsize=4096)
+def _standard_crop_name(name: str) -> str:
+    """Canonical crop name; a run only sees a handful of distinct names"""
+    name = name.strip().lower()
+    return _CROP_NAME_MAP.get(name, name.title())
+
+
 class TextCleaner:
     """
     Text preprocessing for NLP pipelines
@@ -58,6 +124,13 @@ class TextCleaner:
         'liters': 'L',
         'liter': 'L',
         'l/m2': 'L/m²',
+        # Abbreviation expansion turns "mm per day" into "millimeters per day"
+        'millimeters per day': 'mm/day',
+        'millimeter per day': 'mm/day',
+        'millimeters d-1': 'mm/day',
+        'millimeter d-1': 'mm/day',
+        'liters/m2': 'L/m²',
+        'liter/m2': 'L/m²',
         'hours': 'hours',
         'hour': 'hours',
         'hrs': 'hours',
@@ -70,6 +143,31 @@ class TextCleaner:
         'percentage': '%',
     }
     
+    # Written numbers converted to digits for key terms
+    NUMBER_WORDS = {
+        'zero': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4',
+        'five': '5', 'six': '6', 'seven': '7', 'eight': '8', 'nine': '9',
+        'ten': '10', 'twenty': '20', 'thirty': '30'
+    }
+    
+    # Compiled once at import: one pass per mapping instead of one per key
+    _ABBR_UNION = _union_pattern(ABBREVIATIONS)
+    _UNIT_UNION = _union_pattern(UNITS_MAP)
+    _NUMBER_WORD_UNION = _union_pattern(NUMBER_WORDS)
+    # Deletes ASCII capitals: the length drop counts them without a per-character loop
+    _DROP_ASCII_UPPER = str.maketrans('', '', string.ascii_uppercase)
+    _ASCII_UPPER_BYTES = string.ascii_uppercase.encode()
+    _NON_ASCII_RE = re.compile(r'[^\x00-\x7f]+')
+    
+    # Citation, reference and sentence patterns
+    _CITATION_BRACKET_RE = re.compile(r'\[\d+(?:,\s*\d+)*\]')
+    _CITATION_AUTHOR_RE = re.compile(r'\([A-Z][a-z]+(?:\s+et\s+al\.?)?,\s*\d{4}[a-z]?\)')
+    _ALSO_SEE_RE = re.compile(r'also see.*?(?:for more|more info|details).*', re.IGNORECASE)
+    _URL_RE = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+    _REFS_SECTION_RE = re.compile(r'\n\s*References?\s*\n', re.IGNORECASE)
+    _ABBR_DOT_RE = re.compile(r'(Dr|Mr|Mrs|Ms|Prof|Sr|Jr|vs|vol|fig|et al)\.')
+    _SENT_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+    
     def __init__(self):
         self.contraction_pattern = re.compile(r"(\w+)'(\w+)")
         self.whitespace_pattern = re.compile(r'\s+')
@@ -104,63 +202,57 @@ class TextCleaner:
     
     def _normalize_unicode(self, text: str) -> str:
         """Normalize unicode characters"""
+        # ASCII text is already in NFKC form
+        if text.isascii():
+            return text
         return unicodedata.normalize('NFKC', text)
     
     def _expand_abbreviations(self, text: str) -> str:
         """Expand common agricultural abbreviations"""
-        # Sort by length (longest first) to avoid partial matches
-        sorted_abbrs = sorted(self.ABBREVIATIONS.items(), key=lambda x: len(x[0]), reverse=True)
-        
-        for abbr, full in sorted_abbrs:
-            # Use word boundaries to avoid matching inside words
-            pattern = re.compile(r'\b' + re.escape(abbr) + r'\b', re.IGNORECASE)
-            text = pattern.sub(full, text)
-        return text
+        # Word boundaries avoid matching inside words
+        return _substitute(self._ABBR_UNION, text)
     
     def _normalize_units(self, text: str) -> str:
         """Standardize unit representations"""
-        for variant, standard in self.UNITS_MAP.items():
-            pattern = re.compile(r'\b' + re.escape(variant) + r'\b', re.IGNORECASE)
-            text = pattern.sub(standard, text)
-        return text
+        return _substitute(self._UNIT_UNION, text)
     
     def _remove_citations(self, text: str) -> str:
         """Remove academic citations like [1], (Author, 2020)"""
+        # Each pattern is skipped when its opening bracket never occurs
         # Remove bracket citations [1], [2,3], etc.
-        text = re.sub(r'\[\d+(?:,\s*\d+)*\]', '', text)
+        if '[' in text:
+            text = self._CITATION_BRACKET_RE.sub('', text)
         # Remove author-year citations
-        text = re.sub(r'\([A-Z][a-z]+(?:\s+et\s+al\.?)?,\s*\d{4}[a-z]?\)', '', text)
+        if '(' in text:
+            text = self._CITATION_AUTHOR_RE.sub('', text)
         # Remove "Also see..." references
-        text = re.sub(r'also see.*?(?:for more|more info|details).*', '', text, flags=re.IGNORECASE)
+        text = self._ALSO_SEE_RE.sub('', text)
         return text
     
     def _remove_references(self, text: str) -> str:
         """Remove reference sections and URLs"""
         # Remove URLs
-        text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
+        if 'http' in text:
+            text = self._URL_RE.sub('', text)
         # Remove "References" section and everything after
-        text = re.split(r'\n\s*References?\s*\n', text, flags=re.IGNORECASE)[0]
+        if '\n' in text:
+            text = self._REFS_SECTION_RE.split(text, maxsplit=1)[0]
         return text
     
     def _standardize_numbers(self, text: str) -> str:
         """Standardize number formats"""
-        # Convert written numbers to digits for key terms
-        number_words = {
-            'zero': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4',
-            'five': '5', 'six': '6', 'seven': '7', 'eight': '8', 'nine': '9',
-            'ten': '10', 'twenty': '20', 'thirty': '30'
-        }
-        
-        for word, digit in number_words.items():
-            pattern = re.compile(r'\b' + word + r'\b', re.IGNORECASE)
-            text = pattern.sub(digit, text)
-        
-        return text
+        return _substitute(self._NUMBER_WORD_UNION, text)
     
     def _clean_whitespace(self, text: str) -> str:
         """Normalize whitespace"""
-        text = self.whitespace_pattern.sub(' ', text)
-        return text
+        # str.split() breaks on the same characters as \s; leading and
+        # trailing runs still collapse to one space, as with whitespace_pattern
+        words = text.split()
+        if not words:
+            return ' ' if text else text
+        head = ' ' if text[0].isspace() else ''
+        tail = ' ' if text[-1].isspace() else ''
+        return head + ' '.join(words) + tail
     
     def _normalize_case(self, text: str) -> str:
         """Smart case normalization"""
@@ -168,17 +260,29 @@ class TextCleaner:
         lines = []
         for line in text.split('\n'):
             # Detect if line is mostly uppercase (likely header)
-            if sum(1 for c in line if c.isupper()) > len(line) * 0.5:
+            if self._count_uppercase(line) > len(line) * 0.5:
                 lines.append(line.title())
             else:
                 lines.append(line.lower())
         return '\n'.join(lines)
     
+    def _count_uppercase(self, line: str) -> int:
+        """Number of characters c in line with c.isupper()"""
+        if line.isascii():
+            return len(line) - len(line.translate(self._DROP_ASCII_UPPER))
+        # Non-ASCII str.translate is slow: count ASCII capitals on the UTF-8 bytes
+        # (multi-byte sequences never fall in A-Z), then check the non-ASCII runs
+        raw = line.encode('utf-8', 'surrogatepass')
+        upper = len(raw) - len(raw.translate(None, self._ASCII_UPPER_BYTES))
+        for run in self._NON_ASCII_RE.findall(line):
+            upper += sum(1 for c in run if c.isupper())
+        return upper
+    
     def extract_sentences(self, text: str) -> List[str]:
         """Split text into sentences for sentence-level NLP"""
         # Handle common abbreviations that might break sentence detection
-        text = re.sub(r'(Dr|Mr|Mrs|Ms|Prof|Sr|Jr|vs|vol|fig|et al)\.', r'\1<DOT>', text)
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        text = self._ABBR_DOT_RE.sub(r'\1<DOT>', text)
+        sentences = self._SENT_SPLIT_RE.split(text)
         sentences = [s.replace('<DOT>', '.').strip() for s in sentences if len(s) > 10]
         return sentences
 
@@ -304,6 +408,48 @@ class DataCleaner:
         
         return cleaned
     
+    def clean_weather_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Clean and validate weather data, one whole DataFrame at a time
+        Same rules as clean_weather_data, applied column-wise.
+        
+        Args:
+            df: Raw weather rows (clean_weather_data keys as columns)
+            
+        Returns:
+            Cleaned DataFrame; missing or invalid values are NaN/None
+        """
+        cleaned = pd.DataFrame(index=df.index)
+        
+        # Date parsing (each value parsed on its own, as in the row version)
+        if 'date' in df:
+            raw_dates = df['date']
+            dates = pd.to_datetime(raw_dates, errors='coerce', format='mixed')
+            invalid = dates.isna() & raw_dates.notna() & raw_dates.astype(bool)
+            self.validation_errors.extend(f"Invalid date: {d}" for d in raw_dates[invalid])
+            cleaned['date'] = dates.dt.strftime('%Y-%m-%d').where(dates.notna(), None)
+        
+        # Temperature validation with outlier detection
+        temp_max = self._clean_temperature_array(self._numeric_column(df, 'temp_max'))
+        temp_min = self._clean_temperature_array(self._numeric_column(df, 'temp_min'))
+        
+        # Ensure temp_max >= temp_min
+        swap = temp_max < temp_min
+        cleaned['temp_max'] = np.where(swap, temp_min, temp_max)
+        cleaned['temp_min'] = np.where(swap, temp_max, temp_min)
+        cleaned['temp_mean'] = self._clean_temperature_array(self._numeric_column(df, 'temp_mean'))
+        
+        # Precipitation, solar radiation and wind speed (non-negative)
+        cleaned['precipitation'] = self._clean_numeric_array(self._numeric_column(df, 'precipitation'), 0)
+        cleaned['evapotranspiration'] = self._clean_numeric_array(self._numeric_column(df, 'evapotranspiration'))
+        cleaned['solar_radiation'] = self._clean_numeric_array(self._numeric_column(df, 'solar_radiation'), 0)
+        
+        # Humidity (0-100)
+        cleaned['humidity'] = self._clean_numeric_array(self._numeric_column(df, 'humidity'), 0, 100)
+        cleaned['wind_speed'] = self._clean_numeric_array(self._numeric_column(df, 'wind_speed'), 0)
+        
+        return cleaned
+    
     def clean_crop_requirements(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Clean extracted crop requirement data
@@ -425,6 +571,31 @@ class DataCleaner:
         except (ValueError, TypeError):
             return None
     
+    def _numeric_column(self, df: pd.DataFrame, column: str) -> np.ndarray:
+        """Column as a float array (NaN where missing or not numeric)"""
+        if column not in df:
+            return np.full(len(df), np.nan)
+        return pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    
+    def _clean_temperature_array(self, values: np.ndarray) -> np.ndarray:
+        """Array form of _clean_temperature (NaN for missing/invalid)"""
+        # If value > 60, likely Fahrenheit - convert
+        values = np.where(values > 60, (values - 32) * 5/9, values)
+        min_val, max_val = self.VALID_RANGES['temperature_c']
+        valid = (values >= min_val) & (values <= max_val)
+        values = np.where(valid, values, np.nan)
+        return np.round(values, 1, out=values)
+    
+    def _clean_numeric_array(self, values: np.ndarray, min_val: Optional[float] = None,
+                             max_val: Optional[float] = None) -> np.ndarray:
+        """Array form of _clean_numeric, optionally clamped (NaN for missing/inf)"""
+        # np.where makes the one copy; rounding and clamping then work in place
+        values = np.where(np.isfinite(values), values, np.nan)
+        np.round(values, 3, out=values)
+        if min_val is not None or max_val is not None:
+            np.clip(values, min_val, max_val, out=values)
+        return values
+    
     def _normalize_water_requirement(self, value: Optional[float]) -> Optional[float]:
         """Convert various water units to mm/day"""
         if value is None:
@@ -447,36 +618,7 @@ class DataCleaner:
         if not name:
             return "Unknown"
         
-        name = name.strip().lower()
-        
-        # Common name mappings
-        name_map = {
-            'maize': 'Maize',
-            'corn': 'Maize',
-            'zea mays': 'Maize',
-            'wheat': 'Wheat',
-            'triticum': 'Wheat',
-            'bread wheat': 'Wheat',
-            'durum wheat': 'Wheat',
-            'rice': 'Rice',
-            'oryza sativa': 'Rice',
-            'paddy': 'Rice',
-            'soybean': 'Soybean',
-            'soy': 'Soybean',
-            'glycine max': 'Soybean',
-            'soya': 'Soybean',
-            'potato': 'Potato',
-            'solanum tuberosum': 'Potato',
-            'irish potato': 'Potato',
-            'tomato': 'Tomato',
-            'solanum lycopersicum': 'Tomato',
-            'barley': 'Barley',
-            'hordeum vulgare': 'Barley',
-            'cotton': 'Cotton',
-            'gossypium': 'Cotton',
-        }
-        
-        return name_map.get(name, name.title())
+        return _standard_crop_name(name)
     
     def _infer_texture(self, clay: Optional[float], 
                       sand: Optional[float], 
@@ -510,6 +652,36 @@ class DataCleaner:
         else:
             return "Loam"
     
+    def infer_texture_batch(self, clay, sand, silt) -> np.ndarray:
+        """
+        Vectorized _infer_texture over arrays of clay/sand/silt contents
+        Missing (None/NaN) or zero inputs give None, as in the row version.
+        """
+        clay, sand, silt = (np.asarray(v, dtype=float) for v in (clay, sand, silt))
+        valid = (clay != 0) & (sand != 0) & (silt != 0)
+        valid &= ~(np.isnan(clay) | np.isnan(sand) | np.isnan(silt))
+        
+        # Normalize to 100% (invalid rows are masked out below)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            total = clay + sand + silt
+            clay_pct = (clay / total) * 100
+            sand_pct = (sand / total) * 100
+            silt_pct = (silt / total) * 100
+        
+        # Same USDA triangle as _infer_texture, first match wins
+        conditions = [
+            (sand_pct >= 85) & (silt_pct + 1.5 * clay_pct < 15),
+            (silt_pct >= 80) & (clay_pct < 12),
+            clay_pct >= 40,
+            (sand_pct >= 52) & (silt_pct + 2 * clay_pct < 50),
+            (silt_pct >= 50) & (clay_pct < 27),
+            (clay_pct >= 27) & (clay_pct < 40) & (sand_pct > 20),
+        ]
+        choices = ["Sand", "Silt", "Clay", "Sandy Loam", "Silt Loam", "Clay Loam"]
+        textures = np.select(conditions, choices, default="Loam").astype(object)
+        textures[~valid] = None
+        return textures
+    
     def _validate_range(self, field: str, value: Any) -> bool:
         """Validate value is within acceptable range"""
         if value is None:
@@ -1,7 +1,10 @@
 # etl/transform/nlp_extractor.py
 import spacy
 import re
-from typing import Dict, List, Optional, Tuple
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
 from dataclasses import dataclass
 import logging
 
@@ -24,6 +27,26 @@ class ExtractedRequirements:
     confidence_score: float
     extraction_method: str
     raw_evidence: List[str]
+    
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray], index: int) -> 'ExtractedRequirements':
+        """Rebuild one record from CropRequirementExtractor.batch_extract_columns output"""
+        numeric = {}
+        for name in NUMERIC_FIELDS:
+            value = columns[name][index]
+            numeric[name] = None if np.isnan(value) else float(value)
+        return cls(
+            crop_name=columns['crop_name'][index],
+            extraction_method="hybrid_regex_spacy",
+            raw_evidence=columns['raw_evidence'][index],
+            **numeric
+        )
+
+# ExtractedRequirements fields stored as float64 columns (NaN = not found)
+NUMERIC_FIELDS = (
+    'temp_min_c', 'temp_max_c', 'water_mm_day', 'sunlight_hours',
+    'ph_min', 'ph_max', 'confidence_score'
+)
 
 class CropRequirementExtractor:
     """
@@ -34,30 +57,54 @@ class CropRequirementExtractor:
     # Regex patterns for different requirement types
     PATTERNS = {
         'temperature_range': [
-            r'(?:temperature|temp)[^\d]*(\d+)[°°\s]*[Cc][^\d]*(?:to|and|-)[^\d]*(\d+)[°°\s]*[Cc]',
-            r'(\d+)\s*°?[Cc]\s*(?:to|-)\s*(\d+)\s*°?[Cc]',
-            r'optimal.*?(\d+)[°°\s]*[Cc].*?(?:to|and|-).*?(\d+)[°°\s]*[Cc]',
-            r'grow.*?between.*?(\d+)[°°\s]*[Cc].*?and.*?(\d+)[°°\s]*[Cc]'
+            r'(?:temperature|temp)[^\d]*+(\d++)[°°\s]*+[Cc](?>[^\d]*(?:to|and|-)[^\d]*)(\d++)[°°\s]*+[Cc]',
+            r'(\d++)\s*+°?[Cc]\s*+(?:to|-)\s*+(\d++)\s*+°?[Cc]',
+            r'optimal.*?(\d++)[°°\s]*+[Cc].*?(?:to|and|-).*?(\d++)[°°\s]*+[Cc]',
+            r'grow.*?between.*?(\d++)[°°\s]*+[Cc].*?and.*?(\d++)[°°\s]*+[Cc]'
         ],
         'water_requirement': [
-            r'(\d+\.?\d*)\s*(?:mm|millimeters?)\s*(?:per|\/)\s*(?:day|d)',
-            r'water.*?(\d+\.?\d*)\s*(?:mm|millimeters?)',
-            r'irrigation.*?(\d+\.?\d*)\s*(?:mm|L)',
-            r'requires?\s+(\d+\.?\d*)\s*(?:mm|cm)\s*(?:of\s+)?water'
+            r'((?>\d+\.?\d*))\s*+(?:mm|millimeters?)\s*+(?:per|\/)\s*+(?:day|d)',
+            r'water.*?((?>\d+\.?\d*))\s*+(?:mm|millimeters?)',
+            r'irrigation.*?((?>\d+\.?\d*))\s*+(?:mm|L)',
+            r'requires?\s++((?>\d+\.?\d*))\s*+(?:mm|cm)\s*+(?:of\s+)?water'
         ],
         'sunlight': [
-            r'(\d+\.?\d*)\s*(?:hours?|hrs?|h)\s*(?:of\s+)?(?:sun|light|daylight)',
-            r'sun.*?(\d+)[\s-]*(?:hours?|hrs?)',
-            r'full\s+sun.*?(\d+)\s*(?:hours?|hrs?)',
-            r'light.*?(\d+)\s*(?:hours?|hrs?)'
+            r'((?>\d+\.?\d*))\s*+(?:hours?|hrs?|h)\s*+(?:of\s+)?(?:sun|light|daylight)',
+            r'sun.*?(\d++)[\s-]*+(?:hours?|hrs?)',
+            r'full\s++sun.*?(\d++)\s*+(?:hours?|hrs?)',
+            r'light.*?(\d++)\s*+(?:hours?|hrs?)'
         ],
         'ph_range': [
-            r'pH\s+(\d+\.?\d*)\s*(?:to|-)\s*(\d+\.?\d*)',
-            r'pH.*?range.*?(\d+\.?\d*).*?(?:to|-).*?(\d+\.?\d*)',
-            r'(?:acidic|alkaline).*?pH\s+(\d+\.?\d*)\s*(?:to|-)\s*(\d+\.?\d*)'
+            r'pH\s++((?>\d+\.?\d*))\s*+(?:to|-)\s*+((?>\d+\.?\d*))',
+            r'pH.*?range.*?((?>\d+\.?\d*)).*?(?:to|-).*?((?>\d+\.?\d*))',
+            r'(?:acidic|alkaline).*?pH\s++((?>\d+\.?\d*))\s*+(?:to|-)\s*+((?>\d+\.?\d*))'
         ]
     }
     
+    # PATTERNS compiled once, in the same order
+    _COMPILED_PATTERNS = {
+        kind: [re.compile(p, re.IGNORECASE) for p in patterns]
+        for kind, patterns in PATTERNS.items()
+    }
+    
+    # Words each pattern cannot match without, in PATTERNS order
+    PATTERN_KEYWORDS = {
+        'temperature_range': [('temp',), (), ('optimal',), ('grow', 'between')],
+        'water_requirement': [(), ('water',), ('irrigation',), ('require', 'water')],
+        'sunlight': [(), ('sun',), ('sun',), ('light',)],
+        'ph_range': [('ph',), ('ph', 'range'), ('ph', 'acidic_alkaline')]
+    }
+    
+    # One scan finds every keyword present; lookaheads report overlapping ones too
+    _KEYWORD_RE = re.compile('|'.join(
+        f'(?=(?P<{name}>{name.replace("_", "|")}))'
+        for name in ('temp', 'optimal', 'grow', 'between', 'water', 'irrigation',
+                     'require', 'sun', 'light', 'ph', 'range', 'acidic_alkaline')
+    ), re.IGNORECASE)
+    
+    # Below this many sources, starting worker processes costs more than it saves
+    PARALLEL_MIN_SOURCES = 64
+    
     def __init__(self):
         self.nlp = nlp
         self.confidence_weights = {
@@ -66,29 +113,47 @@ class CropRequirementExtractor:
             'nlp_entity': 0.7,
             'contextual': 0.5
         }
+        # Results depend on the text alone, and boilerplate paragraphs
+        # repeat across crawled sources
+        self._scan_cache = lru_cache(maxsize=2048)(self._scan_fields)
     
     def extract(self, text: str, crop_name: str) -> ExtractedRequirements:
         """Main extraction pipeline"""
-        text_lower = text.lower()
+        return ExtractedRequirements(
+            crop_name=crop_name,
+            extraction_method="hybrid_regex_spacy",
+            **self._extract_fields(text)
+        )
+    
+    def _extract_fields(self, text: str) -> Dict[str, Any]:
+        """Extracted values and evidence of text, keyed by ExtractedRequirements field"""
+        # Cached entries are immutable; callers get their own evidence list
+        fields = dict(self._scan_cache(text))
+        fields['raw_evidence'] = list(fields['raw_evidence'])
+        return fields
+    
+    def _scan_fields(self, text: str) -> Tuple[Tuple[str, Any], ...]:
+        """Run every extractor over text; (field, value) pairs, evidence as a tuple"""
+        keywords = self._find_keywords(text)
         evidence = []
         
         # Temperature extraction
-        temp_min, temp_max, temp_evidence = self._extract_temperature(text)
+        temp_min, temp_max, temp_evidence = self._extract_temperature(text, keywords)
         if temp_evidence:
             evidence.extend(temp_evidence)
         
         # Water extraction
-        water, water_evidence = self._extract_water(text)
+        water, water_evidence = self._extract_water(text, keywords)
         if water_evidence:
             evidence.append(water_evidence)
         
         # Sunlight extraction
-        sun, sun_evidence = self._extract_sunlight(text)
+        sun, sun_evidence = self._extract_sunlight(text, keywords)
         if sun_evidence:
             evidence.append(sun_evidence)
         
         # pH extraction
-        ph_min, ph_max, ph_evidence = self._extract_ph(text)
+        ph_min, ph_max, ph_evidence = self._extract_ph(text, keywords)
         if ph_evidence:
             evidence.extend(ph_evidence)
         
@@ -101,23 +166,34 @@ class CropRequirementExtractor:
             len(evidence)
         )
         
-        return ExtractedRequirements(
-            crop_name=crop_name,
-            temp_min_c=temp_min,
-            temp_max_c=temp_max,
-            water_mm_day=water,
-            sunlight_hours=sun,
-            ph_min=ph_min,
-            ph_max=ph_max,
-            confidence_score=confidence,
-            extraction_method="hybrid_regex_spacy",
-            raw_evidence=evidence[:5]  # Top 5 evidence snippets
+        return (
+            ('temp_min_c', temp_min),
+            ('temp_max_c', temp_max),
+            ('water_mm_day', water),
+            ('sunlight_hours', sun),
+            ('ph_min', ph_min),
+            ('ph_max', ph_max),
+            ('confidence_score', confidence),
+            ('raw_evidence', tuple(evidence[:5]))  # Top 5 evidence snippets
         )
     
-    def _extract_temperature(self, text: str) -> Tuple[Optional[float], Optional[float], List[str]]:
+    def _find_keywords(self, text: str) -> Set[str]:
+        """PATTERN_KEYWORDS entries occurring in text"""
+        return {m.lastgroup for m in self._KEYWORD_RE.finditer(text)}
+    
+    def _patterns(self, kind: str, keywords: Optional[Set[str]]) -> List[re.Pattern]:
+        """Compiled patterns of kind, minus those missing a keyword (None: all)"""
+        return [
+            pattern for pattern, required in zip(self._COMPILED_PATTERNS[kind],
+                                                 self.PATTERN_KEYWORDS[kind])
+            if keywords is None or keywords.issuperset(required)
+        ]
+    
+    def _extract_temperature(self, text: str,
+                             keywords: Optional[Set[str]] = None) -> Tuple[Optional[float], Optional[float], List[str]]:
         """Extract temperature ranges with evidence"""
-        for pattern in self.PATTERNS['temperature_range']:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
+        for pattern in self._patterns('temperature_range', keywords):
+            matches = pattern.finditer(text)
             for match in matches:
                 try:
                     min_temp = float(match.group(1))
@@ -129,10 +205,11 @@ class CropRequirementExtractor:
                     continue
         return None, None, []
     
-    def _extract_water(self, text: str) -> Tuple[Optional[float], Optional[str]]:
+    def _extract_water(self, text: str,
+                       keywords: Optional[Set[str]] = None) -> Tuple[Optional[float], Optional[str]]:
         """Extract water requirements"""
-        for pattern in self.PATTERNS['water_requirement']:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in self._patterns('water_requirement', keywords):
+            match = pattern.search(text)
             if match:
                 try:
                     value = float(match.group(1))
@@ -143,10 +220,11 @@ class CropRequirementExtractor:
                     continue
         return None, None
     
-    def _extract_sunlight(self, text: str) -> Tuple[Optional[float], Optional[str]]:
+    def _extract_sunlight(self, text: str,
+                          keywords: Optional[Set[str]] = None) -> Tuple[Optional[float], Optional[str]]:
         """Extract sunlight requirements"""
-        for pattern in self.PATTERNS['sunlight']:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in self._patterns('sunlight', keywords):
+            match = pattern.search(text)
             if match:
                 try:
                     hours = float(match.group(1))
@@ -155,18 +233,20 @@ class CropRequirementExtractor:
                 except ValueError:
                     continue
         
-        # Look for qualitative descriptions
-        if 'full sun' in text.lower():
+        # Look for qualitative descriptions (lowercased only when this fallback runs)
+        text_lower = text.lower()
+        if 'full sun' in text_lower:
             return 6.0, "full sun (inferred 6+ hours)"
-        elif 'partial shade' in text.lower():
+        elif 'partial shade' in text_lower:
             return 3.0, "partial shade (inferred 3-6 hours)"
         
         return None, None
     
-    def _extract_ph(self, text: str) -> Tuple[Optional[float], Optional[float], List[str]]:
+    def _extract_ph(self, text: str,
+                    keywords: Optional[Set[str]] = None) -> Tuple[Optional[float], Optional[float], List[str]]:
         """Extract pH preferences"""
-        for pattern in self.PATTERNS['ph_range']:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in self._patterns('ph_range', keywords):
+            match = pattern.search(text)
             if match:
                 try:
                     min_ph = float(match.group(1))
@@ -195,10 +275,44 @@ class CropRequirementExtractor:
         
         return min(base_score + evidence_bonus, 1.0)
     
-    def batch_extract(self, sources: List) -> List[ExtractedRequirements]:
-        """Process multiple crop sources"""
-        results = []
-        for source in sources:
-            extracted = self.extract(source.raw_text, source.crop_name)
-            results.append(extracted)
-        return results
\ No newline at end of file
+    def batch_extract(self, sources: List, max_workers: Optional[int] = None) -> List[ExtractedRequirements]:
+        """
+        Process multiple crop sources
+        Extraction is regex-only (no spaCy Doc is built) and holds the GIL, so
+        large batches are spread over worker processes, in input order.
+        """
+        if len(sources) < self.PARALLEL_MIN_SOURCES:
+            return [self.extract(source.raw_text, source.crop_name) for source in sources]
+        
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(_extract_worker, sources, chunksize=32))
+    
+    def batch_extract_columns(self, sources: List) -> Dict[str, np.ndarray]:
+        """
+        Column-wise batch_extract, for aggregations over many sources
+        One float64 array per NUMERIC_FIELDS entry (NaN when not found), plus
+        object arrays 'crop_name' and 'raw_evidence'. No ExtractedRequirements
+        is built; use ExtractedRequirements.from_columns for single records.
+        """
+        n = len(sources)
+        columns = {name: np.full(n, np.nan) for name in NUMERIC_FIELDS}
+        columns['crop_name'] = np.empty(n, dtype=object)
+        columns['raw_evidence'] = np.empty(n, dtype=object)
+        
+        for i, source in enumerate(sources):
+            columns['crop_name'][i] = source.crop_name
+            for name, value in self._extract_fields(source.raw_text).items():
+                if value is not None:
+                    columns[name][i] = value
+        return columns
+
+
+# Per-process extractor for batch_extract workers, built on first use
+_worker_extractor: Optional[CropRequirementExtractor] = None
+
+def _extract_worker(source) -> ExtractedRequirements:
+    """ProcessPoolExecutor task: extract one source in a worker process"""
+    global _worker_extractor
+    if _worker_extractor is None:
+        _worker_extractor = CropRequirementExtractor()
+    return _worker_extractor.extract(source.raw_text, source.crop_name)
\ No newline at end of file
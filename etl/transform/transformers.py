@@ -1,80 +1,223 @@
 # etl/transform/transformers.py
-from typing import List, Dict, Tuple, Any
-from datetime import datetime
+from typing import List, Tuple, Iterable, Iterator, Sequence, NamedTuple, Optional
+from datetime import datetime, date
 import hashlib
-import json
+import struct
+import numpy as np
+import orjson
+from functools import lru_cache
 
 from etl.extract.soil_api import SoilData
 from etl.extract.weather_api import WeatherData
 from etl.transform.nlp_extractor import ExtractedRequirements
 
+@lru_cache(maxsize=8192)
+def _date_key(date: str) -> int:
+    """YYYY-MM-DD -> YYYYMMDD (dim_date key); a run only sees a few thousand dates"""
+    return int(date.replace("-", ""))
+
+def _quantize(value, ndigits: int):
+    """Round to the column's DECIMAL scale (None passes through)"""
+    return None if value is None else round(value, ndigits)
+
+# Place value of each YYYY-MM-DD character in the YYYYMMDD key (dashes weigh 0)
+_DATE_KEY_WEIGHTS = np.array([10000000, 1000000, 100000, 10000, 0, 1000, 100, 0, 10, 1],
+                             dtype=np.int32)
+
+def _date_keys(dates: Sequence[str]) -> np.ndarray:
+    """
+    Vectorized _date_key: YYYY-MM-DD strings -> YYYYMMDD int32
+    Digits are read from fixed offsets of the ASCII bytes; no per-string parsing.
+    """
+    digits = np.array(dates, dtype='S10').view(np.uint8).reshape(-1, 10).astype(np.int32) - 48
+    return digits @ _DATE_KEY_WEIGHTS
+
+# fact_weather row layout of columnar batches (loader column order, batch_id excluded);
+# NaN marks a missing value
+WEATHER_DTYPE = np.dtype([
+    ('location_key', np.int32), ('date_key', np.int32),
+    ('latitude', np.float64), ('longitude', np.float64),
+    ('temp_max_c', np.float64), ('temp_min_c', np.float64), ('temp_mean_c', np.float64),
+    ('precipitation_mm', np.float64), ('evapotranspiration_mm', np.float64),
+    ('solar_radiation_mj_m2', np.float64), ('humidity_percent', np.float64),
+    ('wind_speed_ms', np.float64), ('weather_code', np.float64)
+])
+# (column, WeatherData attribute, DECIMAL scale) of the float fields
+_WEATHER_MEASURES = (
+    ('latitude', 'latitude', None), ('longitude', 'longitude', None),
+    ('temp_max_c', 'temp_max', 1), ('temp_min_c', 'temp_min', 1),
+    ('temp_mean_c', 'temp_mean', 1), ('precipitation_mm', 'precipitation', 2),
+    ('evapotranspiration_mm', 'evapotranspiration', 2),
+    ('solar_radiation_mj_m2', 'solar_radiation', 2), ('humidity_percent', 'humidity', 2),
+    ('wind_speed_ms', 'wind_speed', 1), ('weather_code', 'weather_code', None)
+)
+
+# Warehouse rows, fields in loader column order (see etl/load/postgres_loader.py)
+class SoilRow(NamedTuple):
+    location_key: int
+    soil_texture: Optional[str]
+    clay_content_0_5cm: Optional[float]
+    sand_content_0_5cm: Optional[float]
+    silt_content_0_5cm: Optional[float]
+    ph_level_0_5cm: Optional[float]
+    organic_carbon_0_5cm: Optional[float]
+    bulk_density_0_5cm: Optional[float]
+    water_capacity_0_5cm: Optional[float]
+    soil_depth_cm: int
+    extraction_date: date
+    metadata: str
+
+class WeatherRow(NamedTuple):
+    location_key: int
+    date_key: int
+    latitude: float
+    longitude: float
+    temp_max_c: Optional[float]
+    temp_min_c: Optional[float]
+    temp_mean_c: Optional[float]
+    precipitation_mm: Optional[float]
+    evapotranspiration_mm: Optional[float]
+    solar_radiation_mj_m2: Optional[float]
+    humidity_percent: Optional[float]
+    wind_speed_ms: Optional[float]
+    weather_code: Optional[int]
+
+class CropRow(NamedTuple):
+    crop_name: str
+    optimal_temp_min_c: Optional[float]
+    optimal_temp_max_c: Optional[float]
+    water_requirement_mm_day: Optional[float]
+    sunlight_hours_min: Optional[float]
+    sunlight_hours_max: Optional[float]
+    soil_ph_preference_min: Optional[float]
+    soil_ph_preference_max: Optional[float]
+    extraction_confidence: float
+    extraction_date: date
+    source_urls: List[str]
+
+# Coordinates in micro-degrees, the precision of dim_location
+_pack_coordinates = struct.Struct('<qq').pack
+
 class DataTransformer:
     """Transform raw extracted data into warehouse-ready format"""
     
-    @staticmethod
-    def transform_soil(soil_data: SoilData, location_key: int) -> Dict:
+    def __init__(self):
+        # One extraction date per run instead of a clock read per record
+        self.extraction_date = datetime.now().date()
+    
+    def transform_soil(self, soil_data: SoilData, location_key: int) -> SoilRow:
         """Transform SoilData to database schema"""
-        return {
-            "location_key": location_key,
-            "soil_texture": soil_data.texture,
-            "clay_content_0_5cm": soil_data.clay_0_5cm,
-            "sand_content_0_5cm": soil_data.sand_0_5cm,
-            "silt_content_0_5cm": soil_data.silt_0_5cm,
-            "ph_level_0_5cm": soil_data.ph_0_5cm,
-            "organic_carbon_0_5cm": soil_data.organic_carbon_0_5cm,
-            "bulk_density_0_5cm": soil_data.bulk_density_0_5cm,
-            "water_capacity_0_5cm": soil_data.water_capacity_0_5cm,
-            "soil_depth_cm": 5,
-            "extraction_date": datetime.now().date(),
-            "metadata": json.dumps({
+        return SoilRow(
+            location_key=location_key,
+            soil_texture=soil_data.texture,
+            clay_content_0_5cm=soil_data.clay_0_5cm,
+            sand_content_0_5cm=soil_data.sand_0_5cm,
+            silt_content_0_5cm=soil_data.silt_0_5cm,
+            ph_level_0_5cm=soil_data.ph_0_5cm,
+            organic_carbon_0_5cm=soil_data.organic_carbon_0_5cm,
+            bulk_density_0_5cm=soil_data.bulk_density_0_5cm,
+            water_capacity_0_5cm=soil_data.water_capacity_0_5cm,
+            soil_depth_cm=5,
+            extraction_date=self.extraction_date,
+            metadata=orjson.dumps({
                 "source": "SoilGrids",
                 "timestamp": soil_data.extraction_timestamp,
                 "coordinates": {
                     "lat": soil_data.latitude,
                     "lon": soil_data.longitude
                 }
-            })
-        }
+            }).decode()
+        )
     
     @staticmethod
-    def transform_weather(weather_data: WeatherData, location_key: int) -> Dict:
+    def transform_weather(weather_data: WeatherData, location_key: int) -> WeatherRow:
         """Transform WeatherData to database schema"""
-        date_key = int(weather_data.date.replace("-", ""))
+        date_key = _date_key(weather_data.date)
         
-        return {
-            "location_key": location_key,
-            "date_key": date_key,
-            "latitude": weather_data.latitude,
-            "longitude": weather_data.longitude,
-            "temp_max_c": weather_data.temp_max,
-            "temp_min_c": weather_data.temp_min,
-            "temp_mean_c": weather_data.temp_mean,
-            "precipitation_mm": weather_data.precipitation,
-            "evapotranspiration_mm": weather_data.evapotranspiration,
-            "solar_radiation_mj_m2": weather_data.solar_radiation,
-            "humidity_percent": weather_data.humidity,
-            "wind_speed_ms": weather_data.wind_speed,
-            "weather_code": weather_data.weather_code
-        }
+        return WeatherRow(
+            location_key=location_key,
+            date_key=date_key,
+            latitude=weather_data.latitude,
+            longitude=weather_data.longitude,
+            # Rounded to the fact_weather DECIMAL scales
+            temp_max_c=_quantize(weather_data.temp_max, 1),
+            temp_min_c=_quantize(weather_data.temp_min, 1),
+            temp_mean_c=_quantize(weather_data.temp_mean, 1),
+            precipitation_mm=_quantize(weather_data.precipitation, 2),
+            evapotranspiration_mm=_quantize(weather_data.evapotranspiration, 2),
+            solar_radiation_mj_m2=_quantize(weather_data.solar_radiation, 2),
+            humidity_percent=_quantize(weather_data.humidity, 2),
+            wind_speed_ms=_quantize(weather_data.wind_speed, 1),
+            weather_code=weather_data.weather_code
+        )
+    
+    @staticmethod
+    def transform_weather_batch(weather_data: Iterable[WeatherData], location_key: int) -> Iterator[Tuple]:
+        """
+        Yield fact_weather row tuples straight from WeatherData
+        Same values as transform_weather, in loader column order (batch_id excluded).
+        _quantize is inlined: this runs once per (location, day).
+        """
+        for wd in weather_data:
+            yield (
+                location_key,
+                _date_key(wd.date),
+                wd.latitude, wd.longitude,
+                None if wd.temp_max is None else round(wd.temp_max, 1),
+                None if wd.temp_min is None else round(wd.temp_min, 1),
+                None if wd.temp_mean is None else round(wd.temp_mean, 1),
+                None if wd.precipitation is None else round(wd.precipitation, 2),
+                None if wd.evapotranspiration is None else round(wd.evapotranspiration, 2),
+                None if wd.solar_radiation is None else round(wd.solar_radiation, 2),
+                None if wd.humidity is None else round(wd.humidity, 2),
+                None if wd.wind_speed is None else round(wd.wind_speed, 1),
+                wd.weather_code
+            )
+    
+    @staticmethod
+    def transform_weather_array(weather_data: Sequence[WeatherData], location_key: int) -> np.ndarray:
+        """
+        Columnar transform_weather_batch: one WEATHER_DTYPE structured array
+        Measures are converted in one pass (None -> NaN) and rounded per column.
+        """
+        rows = np.empty(len(weather_data), dtype=WEATHER_DTYPE)
+        if not len(rows):
+            return rows
+        measures = np.array(
+            [tuple(getattr(wd, attr) for _, attr, _ in _WEATHER_MEASURES) for wd in weather_data],
+            dtype=np.float64
+        )
+        rows['location_key'] = location_key
+        rows['date_key'] = _date_keys([wd.date for wd in weather_data])
+        for i, (column, _, ndigits) in enumerate(_WEATHER_MEASURES):
+            values = measures[:, i]
+            rows[column] = values if ndigits is None else np.round(values, ndigits)
+        return rows
     
     @staticmethod
-    def transform_crop_requirements(extracted: ExtractedRequirements) -> Dict:
+    def transform_weather_rows(weather_data: List[WeatherData], location_key: int) -> List[Tuple]:
+        """List form of transform_weather_batch"""
+        return list(DataTransformer.transform_weather_batch(weather_data, location_key))
+    
+    def transform_crop_requirements(self, extracted: ExtractedRequirements) -> CropRow:
         """Transform NLP extraction to crop dimension"""
-        return {
-            "crop_name": extracted.crop_name,
-            "optimal_temp_min_c": extracted.temp_min_c,
-            "optimal_temp_max_c": extracted.temp_max_c,
-            "water_requirement_mm_day": extracted.water_mm_day,
-            "sunlight_hours_min": extracted.sunlight_hours,
-            "sunlight_hours_max": extracted.sunlight_hours,  # Simplified
-            "soil_ph_preference_min": extracted.ph_min,
-            "soil_ph_preference_max": extracted.ph_max,
-            "extraction_confidence": extracted.confidence_score,
-            "extraction_date": datetime.now().date(),
-            "source_urls": extracted.raw_evidence
-        }
+        return CropRow(
+            crop_name=extracted.crop_name,
+            optimal_temp_min_c=extracted.temp_min_c,
+            optimal_temp_max_c=extracted.temp_max_c,
+            water_requirement_mm_day=extracted.water_mm_day,
+            sunlight_hours_min=extracted.sunlight_hours,
+            sunlight_hours_max=extracted.sunlight_hours,  # Simplified
+            soil_ph_preference_min=extracted.ph_min,
+            soil_ph_preference_max=extracted.ph_max,
+            extraction_confidence=extracted.confidence_score,
+            extraction_date=self.extraction_date,
+            source_urls=extracted.raw_evidence
+        )
     
     @staticmethod
+    @lru_cache(maxsize=65536)
     def generate_location_hash(lat: float, lon: float) -> str:
-        """Generate unique hash for location"""
-        return hashlib.md5(f"{lat:.6f},{lon:.6f}".encode()).hexdigest()
\ No newline at end of file
+        """Generate unique hash for location (dedup key, not cryptographic)"""
+        packed = _pack_coordinates(round(lat * 1e6), round(lon * 1e6))
+        return hashlib.blake2b(packed, digest_size=8).hexdigest()
\ No newline at end of file
@@ -6,5 +6,6 @@ Utility Modules
 from .logger import ETLLogger
 from .database import PostgresManager
 from .validators import GeoValidator, CropDataValidator
+from .ratelimit import TokenBucket
 
-__all__ = ['ETLLogger', 'PostgresManager', 'GeoValidator', 'CropDataValidator']
\ No newline at end of file
+__all__ = ['ETLLogger', 'PostgresManager', 'GeoValidator', 'CropDataValidator', 'TokenBucket']
\ No newline at end of file
@@ -1,26 +1,211 @@
 # etl/utils/database.py
-import psycopg2
+import io
+import re
+import struct
+import threading
+import weakref
+import numpy as np
+from psycopg2.pool import ThreadedConnectionPool
 from psycopg2.extras import RealDictCursor, execute_values
 from contextlib import contextmanager
-from typing import List, Dict, Any, Optional
+from hashlib import sha256 as _sha256
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Set
 from etl.config import ETLConfig
 
+# COPY text format escapes; numbers never contain them
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+_COPY_NEEDS_ESCAPE = re.compile(r'[\\\t\n\r]').search
+_COPY_PLAIN_TYPES = frozenset((int, float))
+
+def _copy_value(value: Any) -> str:
+    """Render one field for COPY ... FROM STDIN (text format)"""
+    if value is None:
+        return r'\N'
+    if type(value) in _COPY_PLAIN_TYPES:
+        return str(value)
+    text = str(value)
+    return text.translate(_COPY_ESCAPES) if _COPY_NEEDS_ESCAPE(text) else text
+
+def _text_field(value: Any) -> bytes:
+    raw = str(value).encode()
+    return struct.pack('>i', len(raw)) + raw
+
+# COPY ... (FORMAT binary) framing and per-type field encoders (length + payload)
+_BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+_BINARY_TRAILER = struct.pack('>h', -1)
+_BINARY_NULL = struct.pack('>i', -1)
+_INT4 = struct.Struct('>ii')
+_INT8 = struct.Struct('>iq')
+_FLOAT8 = struct.Struct('>id')
+_BINARY_FIELD = {
+    'int4': lambda value: _INT4.pack(4, int(value)),
+    'int8': lambda value: _INT8.pack(8, int(value)),
+    'float8': lambda value: _FLOAT8.pack(8, value),
+    'text': _text_field,
+}
+_BINARY_DTYPE = {'int4': '>i4', 'int8': '>i8', 'float8': '>f8'}
+
+def _binary_array(array: np.ndarray, types: List[str]) -> Tuple[bytes, List[tuple]]:
+    """
+    Pack a structured array into binary COPY rows in one vectorized pass
+    Rows holding NaN (NULL) are not fixed-width; they come back as tuples with None.
+    """
+    names = array.dtype.names
+    missing = np.zeros(len(array), dtype=bool)
+    for name in names:
+        if array.dtype[name].kind == 'f':
+            missing |= np.isnan(array[name])
+    
+    layout = [('field_count', '>i2')]
+    for name, t in zip(names, types):
+        layout += [(f'{name}_length', '>i4'), (name, _BINARY_DTYPE[t])]
+    complete = array[~missing]
+    packed = np.empty(len(complete), dtype=layout)
+    packed['field_count'] = len(names)
+    for name in names:
+        packed[f'{name}_length'] = packed.dtype[name].itemsize
+        packed[name] = complete[name]
+    
+    partial = [tuple(None if v != v else v for v in row) for row in array[missing].tolist()]
+    return packed.tobytes(), partial
+
+_PREPARE_IDEMPOTENCY_SQL = """
+    PREPARE etl_idempotency_ins (bytea, text, text) AS
+    INSERT INTO etl_idempotency_keys (key_hash, entity_type, entity_key)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (key_hash) DO NOTHING
+    RETURNING key_hash;
+"""
+
+@lru_cache(maxsize=64)
+def _idempotency_prefix(entity_type: str) -> bytes:
+    """Hash input prefix per entity type; a run only uses a handful"""
+    return entity_type.encode() + b':'
+
+def _shard_rows(rows, n_shards: int) -> list:
+    """Split rows (tuples or a structured array) by hash of their first column"""
+    if isinstance(rows, np.ndarray):
+        keys = rows[rows.dtype.names[0]] % n_shards
+        shards = [rows[keys == i] for i in range(n_shards)]
+    else:
+        shards = [[] for _ in range(n_shards)]
+        for row in rows:
+            shards[hash(row[0]) % n_shards].append(row)
+    return [shard for shard in shards if len(shard)]
+
+class _CopySource(io.TextIOBase):
+    """File-like COPY input that formats rows as psycopg2 reads them"""
+    
+    def __init__(self, rows: Iterable[tuple]):
+        self._lines = ('\t'.join(map(_copy_value, row)) + '\n' for row in rows)
+        self._pending = ''
+    
+    def readable(self) -> bool:
+        return True
+    
+    def read(self, size: int = -1) -> str:
+        chunks, length = [self._pending], len(self._pending)
+        for line in self._lines:
+            chunks.append(line)
+            length += len(line)
+            if 0 <= size <= length:
+                break
+        data = ''.join(chunks)
+        if size < 0:
+            self._pending = ''
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
 class PostgresManager:
     def __init__(self, config: ETLConfig):
         self.config = config
         self._pool = None
+        self._pool_lock = threading.Lock()
+        self._local = threading.local()  # Connection of the enclosing transaction()
+        # Pooled connections holding the prepared check_idempotency statement
+        self._idempotency_prepared = weakref.WeakSet()
+    
+    @property
+    def pool(self) -> ThreadedConnectionPool:
+        """Persistent connection pool, opened on first use"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    db = self.config.db
+                    self._pool = ThreadedConnectionPool(
+                        db.pool_min_size,
+                        db.pool_max_size,
+                        db.connection_string,
+                        options=f"-c statement_timeout={db.statement_timeout_ms}",
+                        keepalives=1,
+                        keepalives_idle=db.keepalives_idle
+                    )
+        return self._pool
     
     @contextmanager
     def connection(self):
-        conn = psycopg2.connect(self.config.db.connection_string)
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            # Inside transaction(): errors propagate to it (see savepoint())
+            yield conn
+            return
+        
+        conn = self.pool.getconn()
         try:
             yield conn
             conn.commit()
         except Exception as e:
-            conn.rollback()
+            if not conn.closed:
+                conn.rollback()
             raise e
         finally:
-            conn.close()
+            # Broken connections are discarded instead of going back to the pool
+            self.pool.putconn(conn, close=bool(conn.closed))
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Run every database call of this thread in one transaction
+        Commits on success, rolls back on exception. synchronous_commit is off
+        inside it, so bulk loads do not wait on a WAL flush; keep audit writes outside.
+        """
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL synchronous_commit = off")
+            outer, self._local.conn = getattr(self._local, 'conn', None), conn
+            try:
+                yield conn
+            finally:
+                self._local.conn = outer
+    
+    @contextmanager
+    def savepoint(self):
+        """
+        Let a failing unit of work roll back alone inside transaction()
+        For callers that log and swallow errors: a failed statement would otherwise
+        abort the whole transaction. Outside transaction() this does nothing.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            yield
+            return
+        with conn.cursor() as cur:
+            cur.execute("SAVEPOINT unit")
+            try:
+                yield
+            except Exception:
+                cur.execute("ROLLBACK TO SAVEPOINT unit; RELEASE SAVEPOINT unit")
+                raise
+            cur.execute("RELEASE SAVEPOINT unit")
+    
+    def close(self):
+        """Close every pooled connection"""
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
     
     @contextmanager
     def cursor(self, cursor_factory=None):
@@ -31,10 +216,149 @@ class PostgresManager:
             finally:
                 cursor.close()
     
-    def execute_batch(self, query: str, values: List[tuple], page_size: int = 1000):
-        """Execute batch insert with automatic commit"""
+    def execute_values(self, query: str, values: List[tuple], template: str = None,
+                       page_size: int = 1000):
+        """Multi-row INSERT ... VALUES %s (joined VALUES pages) with automatic commit"""
         with self.cursor() as cur:
-            execute_values(cur, query, values, page_size=page_size)
+            execute_values(cur, query, values, template=template, page_size=page_size)
+    
+    def fetch_batch(self, query: str, values: List[tuple], template: str = None,
+                    page_size: int = 1000) -> List[Dict]:
+        """Execute a multi-row VALUES statement and return its RETURNING rows"""
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
+            return execute_values(cur, query, values, template=template,
+                                  page_size=page_size, fetch=True)
+    
+    def _copy_rows(self, cur, table: str, columns: List[str], rows: Iterable[tuple]):
+        """
+        Stream rows into table with a single COPY
+        Rows are formatted chunk by chunk as they are sent, never buffered whole.
+        """
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", _CopySource(rows))
+    
+    def _copy_rows_binary(self, cur, table: str, columns: List[str], types: List[str],
+                          rows: Iterable[tuple]):
+        """
+        COPY rows in binary format; types are the columns' PostgreSQL types
+        (int4, int8, float8 or text). Numbers are packed as-is, never formatted as text.
+        rows may be a structured array (numeric types only, NaN as NULL).
+        """
+        encoders = [_BINARY_FIELD[t] for t in types]
+        field_count = struct.pack('>h', len(columns))
+        buf = io.BytesIO()
+        buf.write(_BINARY_HEADER)
+        if isinstance(rows, np.ndarray):
+            packed, rows = _binary_array(rows, types)
+            buf.write(packed)
+        for row in rows:
+            buf.write(field_count + b''.join(
+                _BINARY_NULL if value is None else encode(value)
+                for encode, value in zip(encoders, row)
+            ))
+        buf.write(_BINARY_TRAILER)
+        buf.seek(0)
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT binary)", buf)
+    
+    def copy_batch(self, table: str, columns: List[str], rows: Iterable[tuple],
+                   types: Optional[List[str]] = None):
+        """
+        Append rows to table with COPY ... FROM STDIN (no conflict handling)
+        types switches to binary COPY (see _copy_rows_binary).
+        """
+        with self.cursor() as cur:
+            if types is None:
+                self._copy_rows(cur, table, columns, rows)
+            else:
+                self._copy_rows_binary(cur, table, columns, types, rows)
+    
+    def parallel_copy(self, table: str, columns: List[str], rows, n_workers: int = 4,
+                      types: Optional[List[str]] = None):
+        """
+        Append rows over n_workers concurrent COPY streams, one pooled connection each
+        Rows are sharded by their first column (e.g. location_key). Each shard commits
+        on its own connection, outside any enclosing transaction(): meant for
+        backfills into tables without conflicting rows, not for upserts.
+        """
+        shards = _shard_rows(rows, n_workers)
+        if len(shards) <= 1:
+            for shard in shards:
+                self.copy_batch(table, columns, shard, types)
+            return
+        with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+            futures = [pool.submit(self.copy_batch, table, columns, shard, types) for shard in shards]
+            for future in futures:
+                future.result()
+    
+    def _stage_rows(self, cur, table: str, columns: List[str], rows: List[tuple],
+                    types: Optional[List[str]] = None) -> str:
+        """
+        COPY rows into a temporary staging copy of table; returns its name
+        Callers drop it in their final statement: several loads may share one transaction().
+        With types, the staging columns get those types and rows go over binary COPY;
+        the INSERT/UPDATE from staging casts them to the table's own types.
+        """
+        stage = f"{table}_stage"
+        if types is None:
+            cur.execute(
+                f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS "
+                f"SELECT {', '.join(columns)} FROM {table} WITH NO DATA"
+            )
+            self._copy_rows(cur, stage, columns, rows)
+        else:
+            definitions = ", ".join(f"{c} {t}" for c, t in zip(columns, types))
+            cur.execute(f"CREATE TEMP TABLE {stage} ({definitions}) ON COMMIT DROP")
+            self._copy_rows_binary(cur, stage, columns, types, rows)
+        return stage
+    
+    def copy_upsert(self, table: str, columns: List[str], rows: List[tuple], on_conflict: str,
+                    constants: Optional[Dict[str, Any]] = None, types: Optional[List[str]] = None):
+        """
+        Bulk upsert: COPY into a temp staging table, then one INSERT ... SELECT
+        on_conflict is the trailing ON CONFLICT clause of that INSERT.
+        constants fill extra columns with one bound value instead of a per-row field.
+        types switches staging to binary COPY (see _stage_rows).
+        """
+        constants = constants or {}
+        target_list = ", ".join([*columns, *constants])
+        select_list = ", ".join([*columns, *["%s"] * len(constants)])
+        with self.cursor() as cur:
+            stage = self._stage_rows(cur, table, columns, rows, types)
+            # Upsert and cleanup share one round trip
+            cur.execute(
+                f"INSERT INTO {table} ({target_list}) "
+                f"SELECT {select_list} FROM {stage} {on_conflict}; "
+                f"DROP TABLE {stage}",
+                tuple(constants.values()) or None
+            )
+    
+    def copy_merge(self, table: str, columns: List[str], key: List[str], rows: List[tuple],
+                   constants: Optional[Dict[str, Any]] = None, types: Optional[List[str]] = None):
+        """
+        Bulk upsert without ON CONFLICT: COPY into staging, UPDATE ... FROM the
+        staged rows, then INSERT those still missing via LEFT JOIN ... IS NULL
+        Both statements get set-based (hash join) plans; every non-key column is refreshed.
+        """
+        constants = constants or {}
+        match = " AND ".join(f"t.{k} = s.{k}" for k in key)
+        updates = ", ".join([
+            *(f"{c} = s.{c}" for c in columns if c not in key),
+            *(f"{c} = %s" for c in constants)
+        ])
+        target_list = ", ".join([*columns, *constants])
+        select_list = ", ".join([*(f"s.{c}" for c in columns), *["%s"] * len(constants)])
+        with self.cursor() as cur:
+            stage = self._stage_rows(cur, table, columns, rows, types)
+            # Statements run in order within one round trip; ANALYZE first
+            # since temp tables are never auto-analyzed
+            cur.execute(
+                f"ANALYZE {stage}; "
+                f"UPDATE {table} AS t SET {updates} FROM {stage} AS s WHERE {match}; "
+                f"INSERT INTO {table} ({target_list}) "
+                f"SELECT {select_list} FROM {stage} AS s "
+                f"LEFT JOIN {table} AS t ON {match} WHERE t.{key[0]} IS NULL; "
+                f"DROP TABLE {stage}",
+                tuple(constants.values()) * 2 or None
+            )
     
     def fetch_one(self, query: str, params: tuple = None) -> Optional[Dict]:
         with self.cursor(cursor_factory=RealDictCursor) as cur:
@@ -48,16 +372,37 @@ class PostgresManager:
     
     def check_idempotency(self, entity_type: str, entity_key: str) -> bool:
         """Check if data was already processed"""
-        import hashlib
-        key_hash = hashlib.sha256(f"{entity_type}:{entity_key}".encode()).hexdigest()
+        # Raw 32-byte digest, stored as bytea
+        key_hash = _sha256(_idempotency_prefix(entity_type) + entity_key.encode()).digest()
+        
+        with self.cursor() as cur:
+            # Prepared once per session (not transactional), then only executed
+            if cur.connection not in self._idempotency_prepared:
+                cur.execute(_PREPARE_IDEMPOTENCY_SQL)
+                self._idempotency_prepared.add(cur.connection)
+            cur.execute("EXECUTE etl_idempotency_ins (%s, %s, %s)", (key_hash, entity_type, entity_key))
+            result = cur.fetchone()
+            return result is not None  # True if new, False if duplicate
+    
+    def check_idempotency_batch(self, entity_type: str, entity_keys: Iterable[str]) -> Set[str]:
+        """
+        Batch check_idempotency: register every key in one multi-row INSERT
+        Returns the keys that were new; callers keep only those.
+        """
+        prefix = _idempotency_prefix(entity_type)
+        rows = [
+            (_sha256(prefix + key.encode()).digest(), entity_type, key)
+            for key in dict.fromkeys(entity_keys)
+        ]
+        if not rows:
+            return set()
         
         query = """
             INSERT INTO etl_idempotency_keys (key_hash, entity_type, entity_key)
-            VALUES (%s, %s, %s)
+            VALUES %s
             ON CONFLICT (key_hash) DO NOTHING
-            RETURNING key_hash;
+            RETURNING entity_key;
         """
         with self.cursor() as cur:
-            cur.execute(query, (key_hash, entity_type, entity_key))
-            result = cur.fetchone()
-            return result is not None  # True if new, False if duplicate
\ No newline at end of file
+            inserted = execute_values(cur, query, rows, page_size=10000, fetch=True)
+        return {r[0] for r in inserted}
\ No newline at end of file
@@ -11,17 +11,18 @@ class ETLLogger:
         
     def start_batch(self, pipeline_name: str) -> str:
         self.batch_id = f"{pipeline_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
-        self.logger.info(f"Started batch: {self.batch_id}")
+        self.logger.info("Started batch: %s", self.batch_id)
         return self.batch_id
     
+    # Messages use logging's deferred %-formatting: nothing is built when INFO is filtered out
     def log_extract(self, source: str, records: int):
-        self.logger.info(f"[{self.batch_id}] Extracted {records} records from {source}")
+        self.logger.info("[%s] Extracted %d records from %s", self.batch_id, records, source)
     
     def log_transform(self, stage: str, records_in: int, records_out: int):
-        self.logger.info(f"[{self.batch_id}] Transform {stage}: {records_in} -> {records_out}")
+        self.logger.info("[%s] Transform %s: %d -> %d", self.batch_id, stage, records_in, records_out)
     
     def log_load(self, table: str, records: int, operation: str = 'INSERT'):
-        self.logger.info(f"[{self.batch_id}] {operation} {records} records into {table}")
+        self.logger.info("[%s] %s %d records into %s", self.batch_id, operation, records, table)
     
     def log_error(self, error: Exception, context: str = ""):
-        self.logger.error(f"[{self.batch_id}] Error in {context}: {str(error)}", exc_info=True)
\ No newline at end of file
+        self.logger.error("[%s] Error in %s: %s", self.batch_id, context, error, exc_info=True)
\ No newline at end of file
@@ -0,0 +1,45 @@
+# etl/utils/ratelimit.py
+import threading
+import time
+from typing import Dict
+
+class TokenBucket:
+    """
+    Thread-safe token bucket on the monotonic clock
+    Allows bursts of up to `capacity` requests, refilled at `rate` per second.
+    Callers reserve a token under the lock and sleep outside it, so
+    concurrent workers queue up without serializing on the sleep.
+    """
+    
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, n: float = 1.0):
+        """Take n tokens, blocking until they are available"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        
+        if wait > 0:
+            time.sleep(wait)
+
+_registry_lock = threading.Lock()
+
+def shared_bucket(session, host: str, rate: float, capacity: float = 1.0) -> TokenBucket:
+    """
+    Return the per-host bucket attached to an HTTP session
+    Extractors sharing a session share the bucket for the same API host,
+    while different hosts keep independent budgets.
+    """
+    with _registry_lock:
+        buckets: Dict[str, TokenBucket] = session.__dict__.setdefault('_rate_buckets', {})
+        if host not in buckets:
+            buckets[host] = TokenBucket(rate, capacity)
+        return buckets[host]
\ No newline at end of file
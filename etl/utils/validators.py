@@ -1,6 +1,7 @@
 # etl/utils/validators.py
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Sequence
 import re
+import numpy as np
 
 class GeoValidator:
     @staticmethod
@@ -11,21 +12,49 @@ class GeoValidator:
             return False, f"Longitude {lon} out of range [-180, 180]"
         return True, None
     
+    @staticmethod
+    def validate_coordinates_batch(lats: Sequence[float], lons: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized validate_coordinates: (validity mask, indices of invalid points)
+        NaN is invalid, as in the scalar check.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        valid = (lats >= -90) & (lats <= 90) & (lons >= -180) & (lons <= 180)
+        return valid, np.flatnonzero(~valid)
+    
     @staticmethod
     def normalize_coordinates(lat: float, lon: float, precision: int = 6) -> Tuple[float, float]:
         """Round to reduce precision errors"""
         return round(lat, precision), round(lon, precision)
+    
+    @staticmethod
+    def normalize_coordinates_batch(lats: Sequence[float], lons: Sequence[float],
+                                    precision: int = 6) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized normalize_coordinates"""
+        return np.round(np.asarray(lats, dtype=np.float64), precision), \
+            np.round(np.asarray(lons, dtype=np.float64), precision)
 
 class CropDataValidator:
-    TEMP_PATTERN = re.compile(r'(-?\d+\.?\d*)\s*(?:°?[Cc])?')
+    # A '-' right after a number is a range separator, not a sign ('20-30°C')
+    TEMP_PATTERN = re.compile(r'(?<![\d.])(-?\d+\.?\d*)\s*(?:°?[Cc])?')
     WATER_PATTERN = re.compile(r'(\d+\.?\d*)\s*(mm|cm|L|liters?)')
     SUN_PATTERN = re.compile(r'(\d+\.?\d*)\s*(?:hours?|hrs?|h)')
+    TEMP_RANGE = (-50.0, 60.0)  # Plausible air temperatures, °C
+    _temp_finditer = TEMP_PATTERN.finditer  # Bound once (builtin, not rebound per class)
     
     @classmethod
     def extract_temperature(cls, text: str) -> Tuple[Optional[float], Optional[float]]:
-        """Extract min/max temp from text like '20-30°C'"""
-        matches = cls.TEMP_PATTERN.findall(text)
-        if len(matches) >= 2:
-            temps = [float(m[0]) for m in matches[:2]]
-            return min(temps), max(temps)
+        """
+        Extract min/max temp from text like '20-30°C'
+        Uses the first two values within TEMP_RANGE; scanning stops there.
+        """
+        low, high = cls.TEMP_RANGE
+        temps = []
+        for match in cls._temp_finditer(text):
+            value = float(match.group(1))
+            if low <= value <= high:
+                temps.append(value)
+                if len(temps) == 2:
+                    return min(temps), max(temps)
         return None, None
\ No newline at end of file
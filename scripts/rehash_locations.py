@@ -0,0 +1,62 @@
+# scripts/rehash_locations.py
+"""
+One-off migration: rewrite dim_location.location_hash in the current format
+Locations loaded before generate_location_hash switched from MD5 (32 hex
+characters) to 64-bit BLAKE2b (16) would not be matched by the loader, which
+would insert every known coordinate a second time. Run once, before the next load:
+
+    python -m scripts.rehash_locations   (from the repository root)
+"""
+from etl.config import get_config
+from etl.utils.database import PostgresManager
+from etl.utils.logger import ETLLogger
+from etl.transform.transformers import DataTransformer
+
+_UPDATE_HASHES_SQL = """
+    UPDATE dim_location d SET location_hash = v.location_hash
+    FROM (VALUES %s) AS v(location_key, location_hash)
+    WHERE d.location_key = v.location_key
+"""
+
+def rehash_locations(db: PostgresManager, logger: ETLLogger) -> int:
+    """Rehash MD5-era rows in place (location_key is unchanged); returns rows updated"""
+    legacy = db.fetch_many(
+        "SELECT location_key, latitude, longitude FROM dim_location "
+        "WHERE length(location_hash) = 32 ORDER BY location_key"
+    )
+    taken = {r['location_hash'] for r in db.fetch_many(
+        "SELECT location_hash FROM dim_location WHERE length(location_hash) <> 32"
+    )}
+    
+    updates, conflicts = [], []
+    for row in legacy:
+        new_hash = DataTransformer.generate_location_hash(float(row['latitude']), float(row['longitude']))
+        if new_hash in taken:
+            # Coordinate already reloaded under the new hash: two location_keys to merge
+            conflicts.append(row['location_key'])
+            continue
+        taken.add(new_hash)
+        updates.append((row['location_key'], new_hash))
+    
+    if updates:
+        db.execute_values(_UPDATE_HASHES_SQL, updates, template="(%s, %s)")
+    logger.logger.info("Rehashed %d dim_location rows", len(updates))
+    if conflicts:
+        logger.logger.warning(
+            "%d locations were loaded again after the hash change and were left as is; "
+            "merge their facts by hand (location_key %s)",
+            len(conflicts), ", ".join(map(str, conflicts))
+        )
+    return len(updates)
+
+def main():
+    config = get_config()
+    config.setup_logging()
+    db = PostgresManager(config)
+    try:
+        rehash_locations(db, ETLLogger("rehash_locations"))
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
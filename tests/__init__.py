@@ -71,6 +71,9 @@ os.environ.setdefault('WEATHER_API_URL', 'https://archive-api.open-meteo.com/v1/
 os.environ.setdefault('MOCK_EXTERNAL_APIS', 'true')
 os.environ.setdefault('SKIP_SLOW_TESTS', 'false')
 
+# Pas de cache disque partagé entre les tests
+os.environ.setdefault('CACHE_DIR', '')
+
 # =============================================================================
 # FIXTURES GLOBALES (disponibles dans tous les fichiers de test)
 # =============================================================================
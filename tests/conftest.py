@@ -14,6 +14,11 @@ os.environ['DB_NAME'] = 'test_agroclimate'
 os.environ['LOG_LEVEL'] = 'DEBUG'
 
 
+def pytest_configure(config):
+    # Declared here as well, so runs without pytest-xdist do not warn on it
+    config.addinivalue_line("markers", "xdist_group(name): run these tests on the same xdist worker")
+
+
 @pytest.fixture(scope='session')
 def db_connection():
     """Create database connection for tests"""
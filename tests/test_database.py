@@ -0,0 +1,115 @@
+# tests/test_database.py
+"""
+Tests for the COPY encoders of the database layer (no database needed)
+"""
+
+import struct
+import numpy as np
+from unittest.mock import Mock
+from etl.utils.database import PostgresManager, _CopySource
+
+_BINARY_DECODERS = {
+    'int4': lambda raw: struct.unpack('>i', raw)[0],
+    'int8': lambda raw: struct.unpack('>q', raw)[0],
+    'float8': lambda raw: struct.unpack('>d', raw)[0],
+    'text': lambda raw: raw.decode(),
+}
+
+
+class _CopyCursor:
+    """Cursor stub keeping what copy_expert was given"""
+    
+    def copy_expert(self, sql, file):
+        self.sql = sql
+        self.data = file.read()
+
+
+def decode_binary_copy(data: bytes, types) -> list:
+    """Parse PGCOPY binary data back into row tuples (None for NULL)"""
+    assert data[:11] == b'PGCOPY\n\xff\r\n\x00'
+    assert struct.unpack_from('>ii', data, 11) == (0, 0)  # flags, header extension
+    pos, rows = 19, []
+    while True:
+        (field_count,) = struct.unpack_from('>h', data, pos)
+        pos += 2
+        if field_count == -1:  # trailer
+            break
+        assert field_count == len(types)
+        row = []
+        for t in types:
+            (length,) = struct.unpack_from('>i', data, pos)
+            pos += 4
+            if length == -1:
+                row.append(None)
+                continue
+            row.append(_BINARY_DECODERS[t](data[pos:pos + length]))
+            pos += length
+        rows.append(tuple(row))
+    assert pos == len(data)
+    return rows
+
+
+class TestBinaryCopy:
+    """Test binary COPY encoding"""
+    
+    def test_structured_array(self):
+        """Complete rows take the vectorized path, NaN rows the per-field path"""
+        dtype = np.dtype([('location_key', np.int32), ('date_key', np.int32), ('temp_max_c', np.float64)])
+        rows = np.array([(1, 20240101, 12.5), (2, 20240102, np.nan), (3, 20240103, -4.25)], dtype=dtype)
+        types = ('int4', 'int4', 'float8')
+        cur = _CopyCursor()
+        
+        PostgresManager(Mock())._copy_rows_binary(cur, 'stage', dtype.names, types, rows)
+        
+        assert cur.sql == "COPY stage (location_key, date_key, temp_max_c) FROM STDIN WITH (FORMAT binary)"
+        assert decode_binary_copy(cur.data, types) == [
+            (1, 20240101, 12.5), (3, 20240103, -4.25),  # packed in one pass
+            (2, 20240102, None),                        # NULL row, encoded per field
+        ]
+    
+    def test_tuple_rows(self):
+        """Tuple rows encode every type, with None as NULL"""
+        types = ('int8', 'text', 'float8')
+        rows = [(2 ** 40, 'café\tcrème', None), (-1, None, 0.5)]
+        cur = _CopyCursor()
+        
+        PostgresManager(Mock())._copy_rows_binary(cur, 'stage', ('a', 'b', 'c'), types, rows)
+        
+        assert decode_binary_copy(cur.data, types) == rows
+
+
+class TestTextCopy:
+    """Test text COPY streaming"""
+    
+    ROWS = [
+        (1, 'a\tb', None),
+        (2.5, 'back\\slash\nnew\rline', 'plain'),
+        (-3, '', 'x'),
+    ]
+    EXPECTED = (
+        '1\ta\\tb\t\\N\n'
+        '2.5\tback\\\\slash\\nnew\\rline\tplain\n'
+        '-3\t\tx\n'
+    )
+    
+    def test_chunked_reads(self):
+        """Small reads carry partial lines over until the source is exhausted"""
+        for size in (1, 3, 7, 64):
+            source = _CopySource(self.ROWS)
+            chunks = []
+            while True:
+                chunk = source.read(size)
+                if not chunk:
+                    break
+                assert len(chunk) <= size
+                chunks.append(chunk)
+            assert ''.join(chunks) == self.EXPECTED
+    
+    def test_read_rest(self):
+        """read(-1) returns the pending carry-over and every remaining line"""
+        source = _CopySource(self.ROWS)
+        
+        head = source.read(5)
+        
+        assert head + source.read(-1) == self.EXPECTED
+        assert source.read(-1) == ''
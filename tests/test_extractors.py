@@ -12,9 +12,73 @@ from datetime import datetime
 from etl.extract.soil_api import SoilGridsExtractor, SoilData
 from etl.extract.weather_api import OpenMeteoExtractor, WeatherData
 from etl.extract.web_scraper import CropRequirementScraper, CropRequirementSource
+from etl.extract.session import build_http_session
+from etl.utils.ratelimit import TokenBucket
 from etl.config import ETLConfig
 
 
+class TestHttpSession:
+    """Test suite for the shared HTTP session"""
+    
+    def test_session_shared_across_extractors(self, mock_logger):
+        """Test one pooled session can be injected into every extractor"""
+        config = ETLConfig()
+        session = build_http_session(config)
+        
+        adapter = session.get_adapter('https://rest.isric.org')
+        assert adapter._pool_maxsize == config.api.pool_maxsize
+        assert adapter.max_retries.total == config.api.max_retries
+        
+        assert SoilGridsExtractor(config, mock_logger, session).session is session
+        assert OpenMeteoExtractor(config, mock_logger, session).session is session
+        assert CropRequirementScraper(config, mock_logger, session).session is session
+    
+    @responses.activate
+    def test_retry_policy_is_status_aware(self, mock_logger):
+        """Test 4xx fails fast while 5xx is retried by the adapter"""
+        url = 'https://rest.isric.org/soilgrids/v2.0/properties/query'
+        config = ETLConfig()
+        config.api.backoff_factor = 0
+        config.api.backoff_jitter = 0
+        session = build_http_session(config)
+        
+        responses.add(responses.GET, url, status=400)
+        assert session.get(url).status_code == 400
+        assert len(responses.calls) == 1
+        
+        responses.replace(responses.GET, url, status=503)
+        assert session.get(url).status_code == 503
+        assert len(responses.calls) == 1 + 1 + config.api.max_retries
+
+
+class TestTokenBucket:
+    """Test suite for the shared rate limiter"""
+    
+    def test_burst_then_throttle(self):
+        """Test burst capacity is free and the next request waits for a refill"""
+        bucket = TokenBucket(rate=2.0, capacity=2)
+        
+        with patch('etl.utils.ratelimit.time.sleep') as mock_sleep:
+            bucket.acquire()
+            bucket.acquire()
+            mock_sleep.assert_not_called()
+            
+            bucket.acquire()
+            wait = mock_sleep.call_args[0][0]
+            assert 0.4 < wait <= 0.5
+    
+    def test_buckets_are_per_host(self, mock_logger):
+        """Test extractors sharing a session keep independent API budgets"""
+        config = ETLConfig()
+        session = build_http_session(config)
+        
+        soil = SoilGridsExtractor(config, mock_logger, session)
+        weather = OpenMeteoExtractor(config, mock_logger, session)
+        
+        assert soil.bucket is not weather.bucket
+        assert SoilGridsExtractor(config, mock_logger, session).bucket is soil.bucket
+
+
 class TestSoilGridsExtractor:
     """Test suite for SoilGrids API extractor"""
     
@@ -61,6 +125,15 @@ class TestSoilGridsExtractor:
         assert result[0].clay_0_5cm == 250
         assert result[0].ph_0_5cm == 6.5  # Scaled from 65
     
+    def test_texture_inference(self, mock_logger):
+        """Test texture classes and missing fractions"""
+        extractor = SoilGridsExtractor(ETLConfig(), mock_logger)
+        
+        assert extractor._infer_texture(45.0, 30.0, 25.0) == "Clay"
+        assert extractor._infer_texture(10.0, 20.0, 70.0) == "Silt Loam"
+        assert extractor._infer_texture(20.0, 40.0, 40.0) == "Loam"
+        assert extractor._infer_texture(None, 40.0, 40.0) is None
+    
     @responses.activate
     def test_api_failure_handling(self, mock_logger):
         """Test graceful handling of API failures"""
@@ -78,6 +151,51 @@ class TestSoilGridsExtractor:
         
         assert len(result) == 0
         mock_logger.log_error.assert_called()
+    
+    @responses.activate
+    def test_concurrent_extraction_preserves_order(self, mock_logger):
+        """Test multiple coordinates are fetched concurrently in input order"""
+        responses.add(
+            responses.GET,
+            'https://rest.isric.org/soilgrids/v2.0/properties/query',
+            json={"properties": {"layers": []}, "timeStamp": "2024-01-15T10:00:00Z"},
+            status=200
+        )
+        
+        config = ETLConfig()
+        config.api.requests_per_second = 100.0
+        extractor = SoilGridsExtractor(config, mock_logger)
+        
+        coords = [(41.8781, -87.6298), (52.52, 13.405), (-23.5505, -46.6333)]
+        result = extractor.extract(coords)
+        
+        assert [(r.latitude, r.longitude) for r in result] == coords
+        assert len(responses.calls) == 3
+        
+        # Duplicate coordinates are only fetched once
+        result = extractor.extract(coords + coords[:1])
+        assert len(result) == 3
+        assert len(responses.calls) == 6
+    
+    @responses.activate
+    def test_cached_response_skips_network(self, mock_logger, tmp_path):
+        """Test repeat extraction is served from the on-disk cache"""
+        responses.add(
+            responses.GET,
+            'https://rest.isric.org/soilgrids/v2.0/properties/query',
+            json={"properties": {"layers": []}, "timeStamp": "2024-01-15T10:00:00Z"},
+            status=200
+        )
+        
+        config = ETLConfig()
+        config.cache_dir = str(tmp_path)
+        extractor = SoilGridsExtractor(config, mock_logger)
+        
+        first = extractor.extract([(41.8781, -87.6298)])
+        second = extractor.extract([(41.8781, -87.6298)])
+        
+        assert first == second
+        assert len(responses.calls) == 1
 
 
 class TestOpenMeteoExtractor:
@@ -112,6 +230,96 @@ class TestOpenMeteoExtractor:
         assert len(result) == 2
         assert result[0].temp_max == 5.2
         assert result[0].date == "2024-01-01"
+        assert result[1].precipitation == 2.5
+        assert result[0].humidity is None  # Variable missing from response
+    
+    @responses.activate
+    def test_historical_weather_dataframe(self, mock_logger):
+        """Test columnar extraction keeps gaps as NaN"""
+        api_response = {
+            "daily": {
+                "time": ["2024-01-01", "2024-01-02"],
+                "temperature_2m_max": [5.2, None],
+                "weather_code": [3]
+            }
+        }
+        
+        responses.add(
+            responses.GET,
+            'https://archive-api.open-meteo.com/v1/archive',
+            json=api_response,
+            status=200
+        )
+        
+        config = ETLConfig()
+        extractor = OpenMeteoExtractor(config, mock_logger)
+        
+        df = extractor.extract_historical_df(52.52, 13.405, "2024-01-01", "2024-01-02")
+        
+        assert list(df.columns) == ["date"] + list(OpenMeteoExtractor.FIELD_MAP)
+        assert df["temp_max"].iloc[0] == 5.2
+        assert df["temp_max"].isna().iloc[1]
+        assert df["weather_code"].iloc[0] == 3
+        assert df["weather_code"].isna().iloc[1]
+    
+    @responses.activate
+    def test_long_range_uses_csv(self, mock_logger):
+        """Test long archive ranges are requested and parsed as CSV"""
+        csv_body = (
+            "latitude,longitude,elevation,utc_offset_seconds,timezone,timezone_abbreviation\n"
+            "52.52,13.42,38.0,3600,Europe/Berlin,CET\n"
+            "\n"
+            "time,temperature_2m_max (°C),precipitation_sum (mm),weather_code (wmo code)\n"
+            "2023-01-01,5.2,0.0,3\n"
+            "2023-01-02,,2.5,\n"
+        )
+        
+        responses.add(
+            responses.GET,
+            'https://archive-api.open-meteo.com/v1/archive',
+            body=csv_body,
+            status=200
+        )
+        
+        config = ETLConfig()
+        extractor = OpenMeteoExtractor(config, mock_logger)
+        
+        result = extractor.extract_historical(52.52, 13.405, "2023-01-01", "2024-01-01")
+        
+        assert responses.calls[0].request.params["format"] == "csv"
+        assert len(result) == 2
+        assert result[0].temp_max == 5.2
+        assert result[0].weather_code == 3
+        assert result[1].temp_max is None
+        assert result[1].precipitation == 2.5
+        assert result[1].humidity is None
+    
+    @responses.activate
+    def test_batch_weather_extraction(self, mock_logger):
+        """Test several locations are fetched in one multi-coordinate request"""
+        api_response = [
+            {"daily": {"time": ["2024-01-01"], "temperature_2m_max": [5.2]}},
+            {"daily": {"time": ["2024-01-01"], "temperature_2m_max": [28.4]}}
+        ]
+        
+        responses.add(
+            responses.GET,
+            'https://archive-api.open-meteo.com/v1/archive',
+            json=api_response,
+            status=200
+        )
+        
+        config = ETLConfig()
+        extractor = OpenMeteoExtractor(config, mock_logger)
+        
+        coords = [(52.52, 13.405), (-23.5505, -46.6333)]
+        result = extractor.extract_historical_batch(coords, "2024-01-01", "2024-01-01")
+        
+        assert len(responses.calls) == 1
+        assert responses.calls[0].request.params["latitude"] == "52.52,-23.5505"
+        assert result[(52.52, 13.405)][0].temp_max == 5.2
+        assert result[(-23.5505, -46.6333)][0].temp_max == 28.4
+        assert result[(-23.5505, -46.6333)][0].latitude == -23.5505
     
     def test_coordinate_validation(self, mock_logger):
         """Test invalid coordinate rejection"""
@@ -157,6 +365,70 @@ class TestCropRequirementScraper:
         assert '20-25°C' in result.raw_text
         assert result.reliability_score == 0.95
     
+    @responses.activate
+    def test_visited_url_not_refetched(self, mock_logger):
+        """Test a page is fetched only once per scraper"""
+        responses.add(
+            responses.GET,
+            'https://www.fao.org/3/x8699e/x8699e04.htm',
+            body='<html><body><div class="content"><p>Wheat</p></div></body></html>',
+            status=200
+        )
+        
+        config = ETLConfig()
+        scraper = CropRequirementScraper(config, mock_logger)
+        
+        assert scraper.scrape_fao_crop_profile('wheat') is not None
+        assert scraper.scrape_fao_crop_profile('wheat') is None
+        assert len(responses.calls) == 1
+    
+    @responses.activate
+    def test_failed_url_refetched(self, mock_logger):
+        """Test a failed fetch is not marked visited"""
+        url = 'https://www.fao.org/3/x8699e/x8699e04.htm'
+        responses.add(responses.GET, url, status=404)
+        responses.add(
+            responses.GET, url,
+            body='<html><body><div class="content"><p>Wheat</p></div></body></html>',
+            status=200
+        )
+        
+        config = ETLConfig()
+        scraper = CropRequirementScraper(config, mock_logger)
+        
+        assert scraper.scrape_fao_crop_profile('wheat') is None
+        assert scraper.scrape_fao_crop_profile('wheat') is not None
+        assert len(responses.calls) == 2
+    
+    @responses.activate
+    def test_usda_scraping(self, mock_logger):
+        """Test USDA PLANTS profile scraping"""
+        html_content = """
+        <html>
+        <head><title>Glycine max - USDA PLANTS</title></head>
+        <body>
+            <dl><dt>pH, Minimum</dt><dd>6.0</dd></dl>
+            <dl><dt>Temperature, Minimum (°F)</dt><dd>-13</dd></dl>
+        </body>
+        </html>
+        """
+        
+        responses.add(
+            responses.GET,
+            'https://plants.usda.gov/core/profile?symbol=GLMA4',
+            body=html_content,
+            status=200
+        )
+        
+        config = ETLConfig()
+        scraper = CropRequirementScraper(config, mock_logger)
+        
+        result = scraper.scrape_usda_plants('GLMA4')
+        
+        assert result is not None
+        assert result.crop_name == 'Glycine max'
+        assert result.raw_text == 'pH, Minimum 6.0\nTemperature, Minimum (°F) -13'
+    
     def test_invalid_crop_handling(self, mock_logger):
         """Test handling of unsupported crops"""
         config = ETLConfig()
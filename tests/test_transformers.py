@@ -4,9 +4,14 @@ Tests for data transformation modules
 """
 
 import pytest
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
 from etl.transform.cleaners import DataCleaner, TextCleaner
 from etl.transform.nlp_extractor import CropRequirementExtractor, ExtractedRequirements
 from etl.transform.transformers import DataTransformer
+from etl.extract.weather_api import WeatherData
+from etl.utils.validators import CropDataValidator
 
 
 class TestTextCleaner:
@@ -84,6 +89,44 @@ class TestDataCleaner:
         assert cleaner._normalize_water_requirement(5.0) == 5.0
         assert cleaner._normalize_water_requirement(0.5) == 5.0  # cm to mm
         assert cleaner._normalize_water_requirement(49.0) == 7.0  # weekly to daily
+    
+    def test_weather_dataframe_matches_rows(self):
+        """Test DataFrame cleaning applies the same rules as the dict version"""
+        cleaner = DataCleaner()
+        rows = [
+            {'date': '2024-01-05', 'temp_max': 20.04, 'temp_min': 25.0, 'temp_mean': 86,
+             'precipitation': -1, 'evapotranspiration': 1.23456, 'solar_radiation': 5,
+             'humidity': 120, 'wind_speed': 3},
+            {'date': 'bad', 'temp_max': None, 'temp_min': 70, 'temp_mean': -60,
+             'precipitation': None, 'evapotranspiration': None, 'solar_radiation': -2,
+             'humidity': -5, 'wind_speed': None},
+        ]
+        
+        expected = [cleaner.clean_weather_data(r) for r in rows]
+        result = cleaner.clean_weather_dataframe(pd.DataFrame(rows))
+        
+        for row, (_, cleaned) in zip(expected, result.iterrows()):
+            for key, value in row.items():
+                if value is None:
+                    assert pd.isna(cleaned[key])
+                else:
+                    assert cleaned[key] == pytest.approx(value)
+        assert cleaner.validation_errors == ['Invalid date: bad'] * 2
+    
+    def test_texture_batch_matches_rows(self):
+        """Test vectorized texture inference against the row version"""
+        cleaner = DataCleaner()
+        samples = [
+            (5, 90, 5), (5, 10, 85), (45, 30, 25), (10, 65, 25),
+            (15, 20, 65), (30, 35, 35), (20, 40, 40), (0, 50, 50), (None, 40, 40)
+        ]
+        clay, sand, silt = zip(*samples)
+        
+        result = cleaner.infer_texture_batch(
+            [np.nan if v is None else v for v in clay], sand, silt
+        )
+        
+        assert list(result) == [cleaner._infer_texture(*s) for s in samples]
 
 
 class TestNLPCropExtractor:
@@ -117,6 +160,39 @@ class TestNLPCropExtractor:
         
         assert result.sunlight_hours is not None
         assert 8 <= result.sunlight_hours <= 10
+    
+    def test_columns_match_records(self, sample_crop_text):
+        """Test column-wise batch extraction against per-record extraction"""
+        extractor = CropRequirementExtractor()
+        sources = [
+            SimpleNamespace(crop_name="wheat", raw_text=sample_crop_text),
+            SimpleNamespace(crop_name="unknown", raw_text="No requirements here."),
+        ]
+        
+        columns = extractor.batch_extract_columns(sources)
+        
+        assert np.isnan(columns['temp_min_c'][1])
+        for i, record in enumerate(extractor.batch_extract(sources)):
+            assert ExtractedRequirements.from_columns(columns, i) == record
+
+
+class TestCropDataValidator:
+    """Test temperature range parsing"""
+    
+    def test_hyphenated_range(self):
+        """Range hyphen is not read as a minus sign"""
+        assert CropDataValidator.extract_temperature('20-30°C') == (20.0, 30.0)
+        assert CropDataValidator.extract_temperature('20-25 °C during growth') == (20.0, 25.0)
+    
+    def test_negative_values(self):
+        """Leading minus signs are kept"""
+        assert CropDataValidator.extract_temperature('-5 to 10°C') == (-5.0, 10.0)
+        assert CropDataValidator.extract_temperature('-10--2°C') == (-10.0, -2.0)
+    
+    def test_out_of_range_values_skipped(self):
+        """Values outside TEMP_RANGE (years, yields) are ignored"""
+        assert CropDataValidator.extract_temperature('In 2019, 18-24°C') == (18.0, 24.0)
+        assert CropDataValidator.extract_temperature('Yield 450 to 650') == (None, None)
 
 
 class TestDataTransformer:
@@ -132,4 +208,47 @@ class TestDataTransformer:
         
         assert hash1 == hash2  # Same coordinates = same hash
         assert hash1 != hash3  # Different coordinates = different hash
-        assert len(hash1) == 32  # MD5 hex length
\ No newline at end of file
+        assert len(hash1) == 16  # 64-bit hex length
+    
+    def test_weather_rows_match_records(self):
+        """Test packed weather tuples carry the same values as single-record rows"""
+        transformer = DataTransformer()
+        
+        wd = WeatherData(52.52, 13.405, "2023-01-02", 5.2, -1.0, 2.1, 0.4,
+                         0.6, 3.2, 88.0, 12.5, 3)
+        
+        record = transformer.transform_weather(wd, 7)
+        rows = transformer.transform_weather_rows([wd], 7)
+        
+        assert rows == [tuple(record)]
+        assert rows[0][:2] == (7, 20230102)
+    
+    def test_weather_array_matches_rows(self):
+        """Test the columnar weather batch holds the tuple values, NaN for None"""
+        weather = [
+            WeatherData(52.52, 13.405, "2023-01-02", 5.2, -1.0, 2.1, 0.4,
+                        0.6, 3.2, 88.0, 12.5, 3),
+            WeatherData(41.88, -87.63, "2024-12-31", 30.04, None, 25.55, None,
+                        5.678, None, 61.0, None, None)
+        ]
+        
+        array = DataTransformer.transform_weather_array(weather, 7)
+        rows = DataTransformer.transform_weather_rows(weather, 7)
+        
+        assert [tuple(None if v != v else v for v in row) for row in array.tolist()] == rows
+        assert array['date_key'].tolist() == [20230102, 20241231]
+    
+    def test_weather_values_rounded_to_column_scale(self):
+        """Test weather values are quantized to the fact_weather DECIMAL scales"""
+        transformer = DataTransformer()
+        
+        wd = WeatherData(52.52, 13.405, "2023-01-02", 5.2371, None, 2.1, 0.4049,
+                         0.6, 3.2, 88.0, 12.5612, 3)
+        
+        record = transformer.transform_weather(wd, 7)
+        
+        assert record.temp_max_c == 5.2
+        assert record.temp_min_c is None
+        assert record.precipitation_mm == 0.40
+        assert record.wind_speed_ms == 12.6
+        assert transformer.transform_weather_rows([wd], 7) == [tuple(record)]
\ No newline at end of file